@@ -4,12 +4,222 @@ Nothing to run here :)
 """
 
 import sudoku_tools as sutils
+import constraint_propagation as cprop
+from search_stats import SearchStats
 import random
 import pprint
+import time
+from itertools import islice
+from functools import lru_cache
+
+def all_digits(size: int=9) -> int:
+    """Get the bitmask with every digit of a board available
+
+    Args:
+        size (int, optional): number of rows of the board. Defaults to 9.
+
+    Returns:
+        int: bitmask where bit n is set for every digit n from 1 to size
+    """
+    return ((1 << size) - 1) << 1
+
+
+def box_index(row: int, col: int, box_size: int=3) -> int:
+    """Get the index (left to right, top to bottom) of the box a cell is in
+
+    Args:
+        row (int): index of row
+        col (int): index of col
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        int: index of the box
+    """
+    return box_size * (row // box_size) + col // box_size
+
+
+def get_peers(row: int, col: int, box_size: int=3) -> list:
+    """Get every other cell that shares a row, col or box with a cell
+
+    Args:
+        row (int): index of row
+        col (int): index of col
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        list: the peer cells (20 on a 9x9 board) as flat indices (row * size + col)
+    """
+    size = box_size * box_size
+    peers = set()
+    for k in range(size):
+        peers.add(row * size + k)
+        peers.add(k * size + col)
+    box_start_row = box_size * (row // box_size)
+    box_start_col = box_size * (col // box_size)
+    for i in range(box_size):
+        for j in range(box_size):
+            peers.add((box_start_row + i) * size + box_start_col + j)
+    peers.discard(row * size + col)
+    return sorted(peers)
+
+
+@lru_cache(maxsize=None)
+def get_peer_table(box_size: int=3) -> list:
+    """Get the peers of every cell, worked out once per board size
+
+    Args:
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        list: the peers of each cell, by flat index
+    """
+    size = box_size * box_size
+    return [get_peers(cell // size, cell % size, box_size) for cell in range(size * size)]
+
+
+CELL_SELECTIONS = ('buckets', 'scan')
+
 
 class Backtracking():
-    def __init__(self, board:list):
+    def __init__(self, board:list, cell_selection:str='buckets', propagate:bool=False, collect_stats:bool=False):
+        """
+        Args:
+            board (list): a 2d list of ints (or a sutils.Board) representing the board, 0 for empty.
+                Any n^2 x n^2 size works (9x9, 16x16, 25x25, ...)
+            cell_selection (str, optional): how to pick the next cell, 'buckets' keeps the
+                cells grouped by number of options and empty peers and updates them on every
+                placement, 'scan' checks every empty cell each time. Defaults to 'buckets'.
+            propagate (bool, optional): run constraint propagation at every step of the search,
+                the most constrained cell then comes from the propagated candidates. Defaults to False.
+            collect_stats (bool, optional): fill in self.stats while solving. Defaults to False.
+        """
+        if cell_selection not in CELL_SELECTIONS:
+            raise ValueError(f'cell_selection must be one of {CELL_SELECTIONS}, got {cell_selection!r}')
         self.board = board
+        self.size = len(board)
+        self.box_size = sutils.get_box_size(self.size)
+        self.all_digits = all_digits(self.size)
+        self.peers = get_peer_table(self.box_size)
+        self.cell_selection = cell_selection
+        self.stats = SearchStats() if collect_stats else None
+        self.depth = 0 # how many guesses deep the search is
+        
+        # bitmasks of the digits already used in each row, col and box
+        self.row_used = [0] * self.size
+        self.col_used = [0] * self.size
+        self.box_used = [0] * self.size
+        self.consistent = True # False if the givens already break a rule
+        
+        for i in range(self.size):
+            for j in range(self.size):
+                num = self.board[i][j]
+                if num == 0:
+                    continue
+                bit = 1 << num
+                box = box_index(i, j, self.box_size)
+                if (self.row_used[i] | self.col_used[j] | self.box_used[box]) & bit:
+                    self.consistent = False
+                self.row_used[i] |= bit
+                self.col_used[j] |= bit
+                self.box_used[box] |= bit
+                
+        self.propagator = cprop.Propagator(board) if propagate else None
+        self.use_buckets = cell_selection == 'buckets' and not propagate
+        if self.use_buckets:
+            self.init_buckets()
+            
+    def init_buckets(self):
+        """Group the empty cells by how many numbers can be placed in them (0 up to the board size),
+        then by how many empty peers they have (to break ties), so the most constrained cell is
+        found by checking at most size + 1 counts and len(peers) + 1 degrees, however many cells are empty
+        """
+        size = self.size
+        max_degree = len(self.peers[0])
+        self.buckets = [[set() for _ in range(max_degree + 1)] for _ in range(size + 1)] # [options][empty peers]
+        self.bucket_sizes = [0] * (size + 1) # empty cells with each number of options
+        self.num_options = [-1] * (size * size) # -1 for filled cells
+        self.degree = [0] * (size * size) # empty peers, kept up to date for filled cells too
+        
+        for cell in range(size * size):
+            row, col = divmod(cell, size)
+            self.degree[cell] = sum(1 for peer in self.peers[cell] if self.board[peer // size][peer % size] == 0)
+            if self.board[row][col] != 0:
+                continue
+            count = self.get_candidates(row, col).bit_count()
+            self.num_options[cell] = count
+            self.buckets[count][self.degree[cell]].add(cell)
+            self.bucket_sizes[count] += 1
+            
+    def update_peers(self, cell: int, change: int):
+        """Recount the options and empty peers of the peers of a cell after it was filled or emptied
+
+        Args:
+            cell (int): flat index of the cell that changed
+            change (int): -1 if the cell was filled, 1 if it was emptied
+        """
+        buckets, bucket_sizes, degree, num_options = self.buckets, self.bucket_sizes, self.degree, self.num_options
+        row_used, col_used, box_used = self.row_used, self.col_used, self.box_used
+        size, box_size, digits = self.size, self.box_size, self.all_digits
+        for peer in self.peers[cell]:
+            old_degree = degree[peer]
+            new_degree = old_degree + change
+            degree[peer] = new_degree
+            count = num_options[peer]
+            if count < 0:
+                continue
+            row, col = divmod(peer, size)
+            # get_candidates inlined, this runs for every peer on every placement
+            box = box_size * (row // box_size) + col // box_size
+            new_count = (digits & ~(row_used[row] | col_used[col] | box_used[box])).bit_count()
+            buckets[count][old_degree].discard(peer)
+            buckets[new_count][new_degree].add(peer)
+            if new_count != count:
+                bucket_sizes[count] -= 1
+                bucket_sizes[new_count] += 1
+                num_options[peer] = new_count
+    
+    def place(self, row: int, col: int, num: int):
+        """Put a number in an empty cell and mark it as used in its row, col and box
+
+        Args:
+            row (int): index of row
+            col (int): index of col
+            num (int): the number to place
+        """
+        bit = 1 << num
+        self.board[row][col] = num
+        self.row_used[row] |= bit
+        self.col_used[col] |= bit
+        self.box_used[box_index(row, col, self.box_size)] |= bit
+        
+        if self.use_buckets:
+            cell = row * self.size + col
+            count = self.num_options[cell]
+            self.buckets[count][self.degree[cell]].discard(cell)
+            self.bucket_sizes[count] -= 1
+            self.num_options[cell] = -1
+            self.update_peers(cell, -1)
+        
+    def remove(self, row: int, col: int):
+        """Undo a placement, setting the cell back as empty
+
+        Args:
+            row (int): index of row
+            col (int): index of col
+        """
+        mask = ~(1 << self.board[row][col])
+        self.board[row][col] = 0
+        self.row_used[row] &= mask
+        self.col_used[col] &= mask
+        self.box_used[box_index(row, col, self.box_size)] &= mask
+        
+        if self.use_buckets:
+            cell = row * self.size + col
+            count = self.get_candidates(row, col).bit_count()
+            self.num_options[cell] = count
+            self.buckets[count][self.degree[cell]].add(cell)
+            self.bucket_sizes[count] += 1
+            self.update_peers(cell, 1)
     
     def get_empty(self) -> tuple:
         """Get the first empty cell
@@ -17,11 +227,23 @@ class Backtracking():
         Returns:
             tuple: the row and col of the empty cell
         """
-        for i in range(9):
-            for j in range(9):
+        for i in range(self.size):
+            for j in range(self.size):
                 if self.board[i][j] == 0:
                     return i, j
         return None # all full
+    
+    def get_candidates(self, row: int, col: int) -> int:
+        """Get the numbers that are valid options for a specific cell as a bitmask
+
+        Args:
+            row (int): index of row
+            col (int): index of col
+
+        Returns:
+            int: bitmask where bit n is set if n can be placed here
+        """
+        return self.all_digits & ~(self.row_used[row] | self.col_used[col] | self.box_used[box_index(row, col, self.box_size)])
         
     def get_valid_numbers(self, row: int, col: int) -> list:
         """Get all the numbers that are valid options for a specific cell
@@ -33,24 +255,8 @@ class Backtracking():
         Returns:
             list: all the valid numbers that can be placed here
         """
-        used = set()
-        
-        # add all in row
-        used.update(self.board[row])
-        
-        # add all in col
-        used.update([self.board[i][col] for i in range(9)])
-        
-        # get the top corner of the 3x3 box
-        box_start_row = 3 * (row // 3)
-        box_start_col = 3 * (col // 3)
-        
-        # add all the 3x3 vals
-        for i in range(3):
-            for j in range(3):
-                used.add(self.board[box_start_row + i][box_start_col + j])
-                
-        options = [num for num in range(1, 10) if num not in used]
+        candidates = self.get_candidates(row, col)
+        options = [num for num in range(1, self.size + 1) if candidates >> num & 1]
         return options
     
     def get_most_conflicts_cell(self) -> tuple:
@@ -59,21 +265,39 @@ class Backtracking():
         Returns:
             tuple: the cell row and col
         """
-        min_options = 10
+        if self.use_buckets:
+            return self.get_most_conflicts_cell_buckets()
+        
+        min_options = self.size + 1
         best_cell = None
         
-        for i in range(9):
-            for j in range(9):
+        for i in range(self.size):
+            for j in range(self.size):
                 if self.board[i][j] == 0:
-                    options = self.get_valid_numbers(i, j)
+                    num_options = self.get_candidates(i, j).bit_count()
                     
-                    if  len(options) < min_options:
-                        min_options = len(options)
+                    if num_options < min_options:
+                        min_options = num_options
                         best_cell = (i, j) # set this to be the most constrained cell
                         
                         if min_options == 1: # only one number can be placed here
                             return best_cell
         return best_cell
+    
+    def get_most_conflicts_cell_buckets(self) -> tuple:
+        """get the most constrained cell from the option buckets, breaking ties by the
+        number of empty peers. Checks at most size + 1 counts and len(peers) + 1 degrees, it
+        doesn't depend on how many cells share the fewest options
+
+        Returns:
+            tuple: the cell row and col
+        """
+        for count, num_cells in enumerate(self.bucket_sizes):
+            if num_cells:
+                for bucket in reversed(self.buckets[count]): # most empty peers first
+                    if bucket:
+                        return divmod(next(iter(bucket)), self.size)
+        return None # all full
 
     # def solve(self) -> list:
     #     """solve the given sudoku
@@ -102,24 +326,171 @@ class Backtracking():
         Returns:
             list: the solved board as a 2d array
         """
+        if not self.consistent:
+            return None # the givens already break a rule
+        
+        if self.propagator:
+            return self.solve_propagated()
+        
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
         empty = self.get_most_conflicts_cell()
+        if stats is not None:
+            stats.add_time('selection', time.perf_counter() - start)
         if not empty:
             return self.board
         
         row, col = empty
         
         # get the numbers that can be placed here
+        if stats is not None:
+            start = time.perf_counter()
         options = self.get_valid_numbers(row, col)
+        if stats is not None:
+            stats.add_time('validation', time.perf_counter() - start)
+            
+        self.depth += 1
         for num in options:
-            self.board[row][col] = num
+            if stats is not None:
+                stats.record_node(self.depth, len(options))
+            # options come from the used bitmasks, so the board stays valid without a full recheck
+            self.place(row, col, num)
             
-            if sutils.is_currently_valid_board(self.board):
-                if self.solve(): # recursive call
-                    return self.board
+            if self.solve(): # recursive call
+                self.depth -= 1
+                return self.board
                 
-            self.board[row][col] = 0 # set back as empty, backtrack
-            
+            self.remove(row, col) # set back as empty, backtrack
+            if stats is not None:
+                stats.backtracks += 1
+        
+        self.depth -= 1
         return None # unsolved
+    
+    def iter_solutions(self):
+        """Go through every solution of the given sudoku, the board is back to how it
+        started once the generator is finished or closed
+
+        Yields:
+            list: each solved board as a new 2d array
+        """
+        if not self.consistent:
+            return
+        if self.propagator:
+            mark = self.propagator.mark()
+            try:
+                if self.propagator.propagate():
+                    yield from self.iter_propagated()
+            finally:
+                self.propagator.undo(mark)
+        else:
+            yield from self.iter_search()
+            
+    def iter_search(self):
+        """recursive generator over the solutions, without propagation"""
+        empty = self.get_most_conflicts_cell()
+        if not empty:
+            yield [list(row) for row in self.board]
+            return
+        
+        row, col = empty
+        for num in self.get_valid_numbers(row, col):
+            self.place(row, col, num)
+            try:
+                yield from self.iter_search() # recursive call
+            finally:
+                self.remove(row, col) # backtrack, even if the caller stops early
+                
+    def iter_propagated(self):
+        """recursive generator over the solutions, with propagation"""
+        propagator = self.propagator
+        cell = propagator.get_most_constrained_cell()
+        if cell is None:
+            yield propagator.to_board()
+            return
+        
+        for num in propagator.get_options(cell):
+            mark = propagator.mark()
+            try:
+                if propagator.assign(cell, num) and propagator.propagate():
+                    yield from self.iter_propagated() # recursive call
+            finally:
+                propagator.undo(mark) # backtrack, even if the caller stops early
+                
+    def count_solutions(self, limit: int=2) -> int:
+        """Count the solutions, stopping as soon as limit is reached
+        (limit=2 is enough to check that a puzzle has exactly one solution)
+
+        Args:
+            limit (int, optional): the most solutions to look for. Defaults to 2.
+
+        Returns:
+            int: the number of solutions found, at most limit
+        """
+        return sum(1 for _ in islice(self.iter_solutions(), limit))
+    
+    def solve_propagated(self) -> list:
+        """solve the given sudoku, running constraint propagation after every placement
+        and undoing it through the propagator's trail when backtracking
+
+        Returns:
+            list: the solved board as a 2d array
+        """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        consistent = self.propagator.propagate()
+        if stats is not None:
+            stats.add_time('propagation', time.perf_counter() - start)
+            
+        solved = consistent and self.search_propagated()
+        if stats is not None:
+            stats.eliminations = self.propagator.eliminations
+        if not solved:
+            return None # unsolved
+        
+        for i, row in enumerate(self.propagator.to_board()):
+            for j, num in enumerate(row):
+                self.board[i][j] = num
+        return self.board
+    
+    def search_propagated(self) -> bool:
+        """recursive search over the propagated candidates
+
+        Returns:
+            bool: if a solution was found
+        """
+        propagator = self.propagator
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        cell = propagator.get_most_constrained_cell()
+        if stats is not None:
+            stats.add_time('selection', time.perf_counter() - start)
+        if cell is None:
+            return True # all full
+        
+        options = propagator.get_options(cell)
+        self.depth += 1
+        for num in options:
+            mark = propagator.mark()
+            if stats is not None:
+                stats.record_node(self.depth, len(options))
+                start = time.perf_counter()
+            consistent = propagator.assign(cell, num) and propagator.propagate()
+            if stats is not None:
+                stats.add_time('propagation', time.perf_counter() - start)
+                
+            if consistent and self.search_propagated(): # recursive call
+                self.depth -= 1
+                return True
+            propagator.undo(mark) # backtrack
+            if stats is not None:
+                stats.backtracks += 1
+        
+        self.depth -= 1
+        return False
             
 def main():
     # test_invalid_blanks = [0, 1, 4, 5, 7, 4, 0, 8, 9]
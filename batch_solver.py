@@ -0,0 +1,221 @@
+"""
+Batch solver that works on many puzzles at once
+All the boards are held in one array and naked/hidden singles are applied to every board
+with numpy ops. Only the boards that are still unsolved after that go to a per-board solver.
+Run this file to solve every puzzle in sudoku_datasets
+"""
+
+import numpy as np
+import time
+import sudoku_tools as sutils
+from dancing_links import DancingLinks
+from functools import lru_cache
+from math import isqrt
+
+DATASET_PATHS = {'easy': 'sudoku_datasets/sudoku_easy.csv',
+                 'medium': 'sudoku_datasets/sudoku_medium.csv',
+                 'hard': 'sudoku_datasets/sudoku_hard.csv'}
+
+
+
+@lru_cache(maxsize=None)
+def get_unit_tables(box_size: int=3) -> tuple:
+    """Get the flat cell indices of every row, col and box, and the units of every cell
+
+    Args:
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        tuple: (27, 9) array with one unit per row and (81, 3) array of the units each cell is
+        in, for a 9x9 board
+    """
+    size = box_size * box_size
+    cells = np.arange(size * size).reshape(size, size)
+    rows = [cells[i] for i in range(size)]
+    cols = [cells[:, j] for j in range(size)]
+    boxes = [cells[i:i+box_size, j:j+box_size].flatten()
+             for i in range(0, size, box_size) for j in range(0, size, box_size)]
+    unit_table = np.array(rows + cols + boxes)
+    cell_unit_table = np.array([np.where((unit_table == cell).any(axis=1))[0] for cell in range(size * size)])
+    return unit_table, cell_unit_table
+
+
+UNIT_TABLE, CELL_UNIT_TABLE = get_unit_tables(3)
+
+# value of every ascii character in a puzzle string, 0 for empty
+CHAR_VALUES = np.zeros(256, dtype=np.uint8)
+for value, char in enumerate(sutils.DIGIT_CHARS, start=1):
+    CHAR_VALUES[ord(char)] = value
+    CHAR_VALUES[ord(char.lower())] = value
+
+
+def board_size(values: np.ndarray) -> int:
+    """Get the number of rows of the boards in an (N, cells) array
+
+    Args:
+        values (np.ndarray): (N, cells) array of boards
+
+    Returns:
+        int: the number of rows (9 for 81 cells)
+    """
+    size = isqrt(values.shape[1])
+    sutils.get_box_size(size) # check it's a valid size
+    return size
+
+
+def parse_puzzles(puzzles) -> np.ndarray:
+    """Turn the 81 character puzzle strings from the csv files into an array
+    (bigger boards use 1-9 then letters, see sudoku_tools.DIGIT_CHARS)
+
+    Args:
+        puzzles: list (or pd.Series) of strings, '.' or '0' for empty cells
+
+    Returns:
+        np.ndarray: (N, 81) uint8 array, 0 for empty
+    """
+    puzzles = list(puzzles)
+    raw = np.frombuffer(''.join(puzzles).encode('ascii'), dtype=np.uint8)
+    return CHAR_VALUES[raw].reshape(len(puzzles), -1)
+
+
+def to_strings(values: np.ndarray) -> list:
+    """Turn an (N, 81) array of boards back into 81 character strings
+
+    Args:
+        values (np.ndarray): (N, 81) array of ints, 0 for empty
+
+    Returns:
+        list: the boards as strings, '.' for empty
+    """
+    chars = np.frombuffer(('.' + sutils.DIGIT_CHARS).encode('ascii'), dtype=np.uint8)
+    raw = chars[values]
+    return [row.tobytes().decode('ascii') for row in raw]
+
+
+def get_candidates(values: np.ndarray) -> np.ndarray:
+    """Get the candidates of every cell of every board
+
+    Args:
+        values (np.ndarray): (N, 81) array of ints, 0 for empty
+
+    Returns:
+        np.ndarray: (N, 81, 9) bool array, True if digit d+1 can go in the cell
+    """
+    size = board_size(values)
+    unit_table, cell_unit_table = get_unit_tables(isqrt(size))
+    placed = values[:, :, None] == np.arange(1, size + 1) # (N, 81, 9)
+    unit_used = placed[:, unit_table].any(axis=2) # (N, 27, 9)
+    cell_used = unit_used[:, cell_unit_table].any(axis=2) # (N, 81, 9)
+    return (values == 0)[:, :, None] & ~cell_used
+
+
+def is_valid_batch(values: np.ndarray) -> np.ndarray:
+    """Check that no number repeats in any unit
+
+    Args:
+        values (np.ndarray): (N, 81) array of ints, 0 for empty
+
+    Returns:
+        np.ndarray: (N,) bool array
+    """
+    return sutils.is_currently_valid_board_batch(values)
+
+
+def propagate_batch(values: np.ndarray) -> tuple:
+    """Apply naked and hidden singles to every board until nothing changes
+
+    Args:
+        values (np.ndarray): (N, 81) array of ints, 0 for empty. Not modified.
+
+    Returns:
+        tuple: the propagated (N, 81) array, and an (N,) bool array that is False for
+        boards found to be unsolvable
+    """
+    values = values.copy()
+    unit_table, _ = get_unit_tables(isqrt(board_size(values)))
+    ok = is_valid_batch(values)
+    active = np.where(ok & (values == 0).any(axis=1))[0]
+
+    while len(active):
+        sub = values[active]
+        cands = get_candidates(sub)
+        counts = cands.sum(axis=2)
+        empty = sub == 0
+
+        # a cell with no candidates means the board can't be solved
+        dead = (empty & (counts == 0)).any(axis=1)
+
+        # naked singles
+        naked = empty & (counts == 1)
+        sub = np.where(naked, cands.argmax(axis=2) + 1, sub).astype(np.uint8)
+        changed = naked.any(axis=1)
+
+        # hidden singles, on the boards that had no naked singles
+        hidden_rows = np.where(~changed & ~dead)[0]
+        if len(hidden_rows):
+            unit_cands = cands[hidden_rows][:, unit_table] # (M, 27, 9 cells, 9 digits)
+            single = unit_cands.sum(axis=2) == 1 # (M, 27, 9 digits)
+            board_idx, unit_idx, digit_idx = np.nonzero(single)
+            cell_pos = unit_cands[board_idx, unit_idx, :, digit_idx].argmax(axis=1)
+            cells = unit_table[unit_idx, cell_pos]
+            rows = hidden_rows[board_idx]
+            sub[rows, cells] = digit_idx + 1
+            changed[rows] = True
+
+        values[active] = sub
+        dead |= ~is_valid_batch(sub)
+        ok[active[dead]] = False
+        active = active[changed & ~dead & (sub == 0).any(axis=1)]
+
+    return values, ok
+
+
+def solve_batch(puzzles, solver_class=DancingLinks) -> tuple:
+    """Solve many puzzles, propagating all of them together first and then searching
+    the ones that are left one at a time
+
+    Args:
+        puzzles: list of 81 character puzzle strings, or an (N, 81) array (any n^2 x n^2 size)
+        solver_class (optional): per-board solver with a solve() -> list method. Defaults to DancingLinks.
+
+    Returns:
+        tuple: (N, 81) uint8 array of solutions (zeros where unsolvable), an (N,) bool array of
+        which boards were solved, and the number of boards that needed the per-board solver
+    """
+    if isinstance(puzzles, np.ndarray):
+        values = puzzles.reshape(len(puzzles), -1).astype(np.uint8)
+    else:
+        values = parse_puzzles(puzzles)
+
+    size = board_size(values)
+    values, ok = propagate_batch(values)
+    residual = np.where(ok & (values == 0).any(axis=1))[0]
+
+    for idx in residual:
+        board = values[idx].reshape(size, size).tolist()
+        solution = solver_class(board).solve()
+        if solution is None:
+            ok[idx] = False
+        else:
+            values[idx] = np.array(solution, dtype=np.uint8).flatten()
+
+    values[~ok] = 0
+    return values, ok, len(residual)
+
+
+def main():
+    import pandas as pd # only needed here, and slow to import
+    for difficulty, path in DATASET_PATHS.items():
+        df = pd.read_csv(path, usecols=['puzzle', 'solution'], dtype=str)
+        start_time = time.perf_counter()
+        solutions, solved, num_searched = solve_batch(df['puzzle'])
+        elapsed_time = time.perf_counter() - start_time
+
+        _, cells_correct = sutils.check_solution_batch(solutions, parse_puzzles(df['solution']))
+        num_correct = np.count_nonzero(cells_correct == solutions.shape[1])
+        print(f'{difficulty}: {num_correct}/{len(df)} correct, '
+              f'{num_searched} needed search, {elapsed_time:.3f}s')
+
+
+if __name__ == "__main__":
+    main()
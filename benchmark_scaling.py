@@ -0,0 +1,106 @@
+"""
+Scaling benchmark: solve time vs board size for each solver engine
+Makes random puzzles for 4x4, 9x9, 16x16 and 25x25 boards by shuffling a pattern solution
+and blanking out cells, then times every engine on the same puzzles. Every engine gets the
+same time limit per puzzle, the genetic algorithm and annealing run on the mutable cells of any
+size so they are in the table too, they just won't solve much past 9x9 in that time.
+Run this file to print the results table
+"""
+
+import sudoku_tools as sutils
+from dancing_links import DancingLinks
+from search_driver import IterativeSearch
+from run_genetic import setup_genetic
+from sudoku_annealing import SudokuAnnealing
+import numpy as np
+import time
+
+# name: function (board, time_limit) -> solved board, or a partial/unsolved board or None past the time limit
+ENGINES = {'backtracking': lambda board, time_limit: IterativeSearch(board, time_limit=time_limit).solve(),
+           'backtracking_scan': lambda board, time_limit: IterativeSearch(board, cell_selection='scan', time_limit=time_limit).solve(),
+           'propagation': lambda board, time_limit: IterativeSearch(board, propagate=True, time_limit=time_limit).solve(),
+           'dlx': lambda board, time_limit: DancingLinks(board, time_limit=time_limit).solve(),
+           'genetic': lambda board, time_limit: setup_genetic(board).evolve(time_limit=time_limit)[0],
+           'annealing': lambda board, time_limit: SudokuAnnealing(board).anneal(time_limit=time_limit)[0]}
+
+
+def generate_solution(box_size: int, rng: np.random.Generator) -> np.ndarray:
+    """Make a random solved board by shuffling the standard pattern solution
+
+    Args:
+        box_size (int): size of the boxes, 3 for a 9x9 board
+        rng (np.random.Generator): random number generator
+
+    Returns:
+        np.ndarray: solved board of shape (box_size^2, box_size^2)
+    """
+    size = box_size * box_size
+    # rows and cols are shuffled within their bands/stacks, and the bands/stacks themselves
+    rows = [band * box_size + r for band in rng.permutation(box_size) for r in rng.permutation(box_size)]
+    cols = [stack * box_size + c for stack in rng.permutation(box_size) for c in rng.permutation(box_size)]
+    nums = rng.permutation(size) + 1
+    pattern = lambda r, c: (box_size * (r % box_size) + r // box_size + c) % size
+    return np.array([[nums[pattern(r, c)] for c in cols] for r in rows])
+
+
+def generate_puzzle(box_size: int, blank_fraction: float, rng: np.random.Generator) -> list:
+    """Make a random puzzle, it will have at least one solution but may have more
+
+    Args:
+        box_size (int): size of the boxes, 3 for a 9x9 board
+        blank_fraction (float): fraction of the cells to blank out
+        rng (np.random.Generator): random number generator
+
+    Returns:
+        list: the puzzle as a 2d array of ints, 0 for empty
+    """
+    board = generate_solution(box_size, rng)
+    blanks = rng.random(board.shape) < blank_fraction
+    board[blanks] = 0
+    return board.tolist()
+
+
+def run_benchmark(box_sizes: tuple=(2, 3, 4, 5), num_puzzles: int=5, blank_fraction: float=0.5,
+                  time_limit: float=10, seed: int=0) -> dict:
+    """Time every engine on the same random puzzles for each board size
+
+    Args:
+        box_sizes (tuple, optional): box sizes to test. Defaults to (2, 3, 4, 5).
+        num_puzzles (int, optional): puzzles per size. Defaults to 5.
+        blank_fraction (float, optional): fraction of cells blanked out. Defaults to 0.5.
+        time_limit (float, optional): seconds each engine gets per puzzle. Defaults to 10.
+        seed (int, optional): random seed for the puzzles. Defaults to 0.
+
+    Returns:
+        dict: (engine, board size): {'times': [...], 'solved': number of valid solutions}
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+    for box_size in box_sizes:
+        size = box_size * box_size
+        puzzles = [generate_puzzle(box_size, blank_fraction, rng) for _ in range(num_puzzles)]
+        for name, solve in ENGINES.items():
+            times = []
+            solved = 0
+            for puzzle in puzzles:
+                start_time = time.perf_counter()
+                solution = solve([row[:] for row in puzzle], time_limit)
+                times.append(time.perf_counter() - start_time)
+                if solution is not None and sutils.is_valid_board(solution):
+                    solved += 1
+            results[(name, size)] = {'times': times, 'solved': solved}
+    return results
+
+
+def main():
+    num_puzzles = 5
+    results = run_benchmark(num_puzzles=num_puzzles)
+    print(f'{"engine":<18} {"size":>7} {"mean (s)":>10} {"max (s)":>10} {"solved":>7}')
+    for (name, size), result in results.items():
+        times = result['times']
+        print(f'{name:<18} {f"{size}x{size}":>7} {np.mean(times):>10.4f} {np.max(times):>10.4f} '
+              f'{result["solved"]:>4}/{num_puzzles}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Bounded, in order streaming of work to a pool of processes
+Items are read lazily in chunks and each chunk is handed to a worker process with
+apply_async. Only a fixed number of chunks are ever in flight, so memory stays flat
+however long the stream is, and the results come back in the order they were read.
+Only the standard library is used, and multiprocessing is only imported when a pool is
+needed, so the command line solver can import this without slowing its startup.
+Nothing to run here :)
+"""
+
+from collections import deque
+from itertools import islice
+
+
+def iter_chunks(items, chunk_size: int):
+    """Split a stream into lists, reading it lazily
+
+    Args:
+        items: any iterable
+        chunk_size (int): items per chunk, the last chunk may be shorter
+
+    Yields:
+        list: the next chunk_size items
+    """
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        yield chunk
+
+
+def map_chunks(solve_chunk, items, processes: int=1, chunk_size: int=64, max_pending: int=None):
+    """Run solve_chunk over a stream in chunks, in order, reading ahead at most max_pending chunks
+
+    Args:
+        solve_chunk (function): takes a list of items and returns the chunk's results. It is run
+            in the worker processes so it has to be picklable (a module level function, or a
+            functools.partial of one)
+        items: iterable of items, read lazily
+        processes (int, optional): worker processes, 1 solves in this process. Defaults to 1.
+        chunk_size (int, optional): items sent to a worker at a time. Defaults to 64.
+        max_pending (int, optional): chunks in flight before reading more items. Defaults to 2 per process.
+
+    Yields:
+        the result of solve_chunk for each chunk, in the order they were read
+    """
+    chunks = iter_chunks(items, chunk_size)
+    if processes == 1:
+        for chunk in chunks:
+            yield solve_chunk(chunk)
+        return
+
+    # Pool.imap would read the whole stream into its task queue, so chunks are submitted
+    # one at a time and reading stops while max_pending of them are unfinished
+    import multiprocessing as mp
+    max_pending = max_pending or 2 * processes
+    with mp.Pool(processes=processes) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(solve_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
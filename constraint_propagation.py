@@ -0,0 +1,360 @@
+"""
+Constraint propagation for sudoku boards
+Keeps a bitmask of candidates for every cell and applies naked singles, hidden singles,
+naked pairs and pointing pairs until nothing changes. Every change is recorded on a trail
+so a search can undo back to an earlier point instead of copying boards.
+Used by the backtracking solver (propagate=True) and the CBR pipeline (refine_grid)
+"""
+
+from functools import lru_cache
+from math import isqrt
+
+TECHNIQUES = ('naked_singles', 'hidden_singles', 'naked_pairs', 'pointing_pairs')
+
+
+def get_units(box_size: int=3) -> list:
+    """Get every row, col and box of the board
+
+    Args:
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        list: the rows, then cols, then boxes (27 units on a 9x9 board), each a list of
+        flat cell indices (row * size + col)
+    """
+    size = box_size * box_size
+    rows = [[row * size + col for col in range(size)] for row in range(size)]
+    cols = [[row * size + col for row in range(size)] for col in range(size)]
+    boxes = []
+    for box_row in range(0, size, box_size):
+        for box_col in range(0, size, box_size):
+            boxes.append([(box_row + i) * size + box_col + j for i in range(box_size) for j in range(box_size)])
+    return rows + cols + boxes
+
+
+@lru_cache(maxsize=None)
+def get_geometry(box_size: int=3) -> tuple:
+    """Get the units and the peers of every cell, worked out once per board size
+
+    Args:
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        tuple: the units, the boxes, and the peers of each cell by flat index
+    """
+    size = box_size * box_size
+    units = get_units(box_size)
+    cell_units = [[] for _ in range(size * size)]
+    for unit in units:
+        for cell in unit:
+            cell_units[cell].append(unit)
+    peers = [sorted(set(c for unit in cell_units[cell] for c in unit) - {cell}) for cell in range(size * size)]
+    return units, units[2 * size:], peers
+
+
+def mask_to_digits(mask: int, size: int=9) -> list:
+    """Turn a candidate bitmask into the digits it contains
+
+    Args:
+        mask (int): candidate bitmask
+        size (int, optional): number of rows of the board. Defaults to 9.
+
+    Returns:
+        list: the digits (1-9, or 1-size) that are set
+    """
+    return [num for num in range(1, size + 1) if mask >> num & 1]
+
+
+class Contradiction(Exception):
+    """Raised internally when a cell or unit runs out of candidates"""
+
+
+class Propagator():
+    def __init__(self, board: list, techniques: tuple=TECHNIQUES):
+        """
+        Args:
+            board (list): a 2d list (or array, or sutils.Board) of ints representing the board, 0 for empty.
+                Any n^2 x n^2 size works
+            techniques (tuple, optional): which deductions propagate() applies, naked singles
+                are always applied. Defaults to all of TECHNIQUES.
+        """
+        for technique in techniques:
+            if technique not in TECHNIQUES:
+                raise ValueError(f'unknown technique {technique!r}, expected one of {TECHNIQUES}')
+        self.techniques = techniques
+        self.size = len(board)
+        self.box_size = isqrt(self.size)
+        if self.box_size * self.box_size != self.size:
+            raise ValueError(f'a board needs a square number of rows, got {self.size}')
+        self.num_cells = self.size * self.size
+        self.all_digits = ((1 << self.size) - 1) << 1
+        self.units, self.boxes, self.peers = get_geometry(self.box_size)
+        self.cands = [self.all_digits] * self.num_cells
+        self.values = [0] * self.num_cells
+        self.trail = [] # (cell, old candidates, old value) for every change
+        self.pending = [] # cells that have been narrowed down to a single candidate
+        self.eliminations = 0
+        self.consistent = True
+
+        for i in range(self.size):
+            for j in range(self.size):
+                num = int(board[i][j])
+                if num != 0 and not self.assign(i * self.size + j, num):
+                    self.consistent = False
+        self.trail = [] # the givens are never undone
+
+    def mark(self) -> int:
+        """Get a point on the trail to undo back to
+
+        Returns:
+            int: the current length of the trail
+        """
+        return len(self.trail)
+
+    def undo(self, mark: int):
+        """Undo every change made since mark
+
+        Args:
+            mark (int): a value returned by mark()
+        """
+        trail = self.trail
+        cands = self.cands
+        values = self.values
+        while len(trail) > mark:
+            cell, old_cands, old_value = trail.pop()
+            cands[cell] = old_cands
+            values[cell] = old_value
+        self.pending = []
+
+    def eliminate(self, cell: int, mask: int):
+        """Remove candidates from a cell
+
+        Args:
+            cell (int): flat index of the cell
+            mask (int): bitmask of the candidates to remove
+
+        Raises:
+            Contradiction: if the cell is left with no candidates
+        """
+        old = self.cands[cell]
+        if not old & mask:
+            return
+        new = old & ~mask
+        if new == 0:
+            raise Contradiction
+        self.trail.append((cell, old, self.values[cell]))
+        self.cands[cell] = new
+        self.eliminations += (old & mask).bit_count()
+        if new & (new - 1) == 0: # only one candidate left
+            self.pending.append(cell)
+
+    def place(self, cell: int, num: int):
+        """Set a cell and remove the number from all its peers
+
+        Args:
+            cell (int): flat index of the cell
+            num (int): the number to place
+
+        Raises:
+            Contradiction: if the number isn't a candidate or a peer runs out of candidates
+        """
+        bit = 1 << num
+        if not self.cands[cell] & bit:
+            raise Contradiction
+        if self.values[cell] == num:
+            return
+        self.trail.append((cell, self.cands[cell], self.values[cell]))
+        self.cands[cell] = bit
+        self.values[cell] = num
+        for peer in self.peers[cell]:
+            self.eliminate(peer, bit)
+
+    def assign(self, cell: int, num: int) -> bool:
+        """Place a number without propagating further
+
+        Args:
+            cell (int): flat index of the cell
+            num (int): the number to place
+
+        Returns:
+            bool: False if this breaks a rule
+        """
+        try:
+            self.place(cell, num)
+        except Contradiction:
+            self.pending = []
+            return False
+        return True
+
+    def propagate(self) -> bool:
+        """Apply the deductions until nothing changes
+
+        Returns:
+            bool: False if the board turned out to be unsolvable
+        """
+        try:
+            while True:
+                self.naked_singles()
+                if 'hidden_singles' in self.techniques and self.hidden_singles():
+                    continue
+                if 'naked_pairs' in self.techniques and self.naked_pairs():
+                    continue
+                if 'pointing_pairs' in self.techniques and self.pointing_pairs():
+                    continue
+                return True
+        except Contradiction:
+            self.pending = []
+            return False
+
+    def naked_singles(self):
+        """Place every cell that has been narrowed down to one candidate"""
+        pending = self.pending
+        while pending:
+            cell = pending.pop()
+            if self.values[cell] == 0:
+                self.place(cell, self.cands[cell].bit_length() - 1)
+
+    def hidden_singles(self) -> bool:
+        """Place any number that only has one possible cell left in a unit
+
+        Returns:
+            bool: if anything was placed
+        """
+        cands = self.cands
+        changed = False
+        for unit in self.units:
+            once = 0
+            twice = 0
+            for cell in unit:
+                mask = cands[cell]
+                twice |= once & mask
+                once |= mask
+            if once != self.all_digits:
+                raise Contradiction # some number has nowhere to go
+            singles = once & ~twice
+            if not singles:
+                continue
+            for cell in unit:
+                mask = cands[cell] & singles
+                if mask and self.values[cell] == 0:
+                    if mask & (mask - 1):
+                        raise Contradiction # two numbers need the same cell
+                    self.place(cell, mask.bit_length() - 1)
+                    self.naked_singles()
+                    changed = True
+        return changed
+
+    def naked_pairs(self) -> bool:
+        """If two cells in a unit share the same two candidates, remove those from the rest of the unit
+
+        Returns:
+            bool: if any candidates were removed
+        """
+        cands = self.cands
+        values = self.values
+        start = self.eliminations
+        for unit in self.units:
+            seen = set()
+            for cell in unit:
+                mask = cands[cell]
+                if values[cell] != 0 or mask.bit_count() != 2:
+                    continue
+                if mask not in seen:
+                    seen.add(mask)
+                    continue
+                for other in unit:
+                    if values[other] == 0 and cands[other] != mask:
+                        self.eliminate(other, mask)
+        self.naked_singles()
+        return self.eliminations != start
+
+    def pointing_pairs(self) -> bool:
+        """If a number's cells in a box all sit on one row (or col), remove it from the
+        rest of that row (or col)
+
+        Returns:
+            bool: if any candidates were removed
+        """
+        cands = self.cands
+        values = self.values
+        start = self.eliminations
+        size = self.size
+        for box in self.boxes:
+            box_cells = set(box)
+            for num in range(1, size + 1):
+                bit = 1 << num
+                cells = [cell for cell in box if values[cell] == 0 and cands[cell] & bit]
+                if len(cells) < 2:
+                    continue
+                rows = {cell // size for cell in cells}
+                cols = {cell % size for cell in cells}
+                if len(rows) == 1:
+                    line = self.units[rows.pop()]
+                elif len(cols) == 1:
+                    line = self.units[size + cols.pop()]
+                else:
+                    continue
+                for other in line:
+                    if other not in box_cells and values[other] == 0:
+                        self.eliminate(other, bit)
+        self.naked_singles()
+        return self.eliminations != start
+
+    def get_most_constrained_cell(self) -> int:
+        """Get the empty cell with the fewest candidates
+
+        Returns:
+            int: flat index of the cell, None if the board is full
+        """
+        best_cell = None
+        min_options = self.size + 1
+        for cell in range(self.num_cells):
+            if self.values[cell] == 0:
+                count = self.cands[cell].bit_count()
+                if count < min_options:
+                    min_options = count
+                    best_cell = cell
+                    if count == 2: # singles are placed by propagation
+                        break
+        return best_cell
+
+    def get_options(self, cell: int) -> list:
+        """Get the numbers that can still go in a cell
+
+        Args:
+            cell (int): flat index of the cell
+
+        Returns:
+            list: the candidate numbers
+        """
+        return mask_to_digits(self.cands[cell], self.size)
+
+    def to_board(self) -> list:
+        """Get the current values as a 2d list, 0 for empty
+
+        Returns:
+            list: board as an array of ints
+        """
+        size = self.size
+        return [self.values[row * size:(row + 1) * size] for row in range(size)]
+
+
+def refine_grid(grid, techniques: tuple=TECHNIQUES):
+    """Fill in every cell that propagation can deduce, used in place of the
+    naked single / naked twins loops of the CBR pipeline
+
+    Args:
+        grid: a 9x9 (or any n^2 x n^2) numpy array or 2d list of ints, 0 for empty
+        techniques (tuple, optional): which deductions to apply. Defaults to all of TECHNIQUES.
+
+    Returns:
+        the same grid with the deduced cells filled, left unchanged if the grid is inconsistent
+    """
+    propagator = Propagator(grid, techniques=techniques)
+    if not propagator.consistent or not propagator.propagate():
+        return grid
+    size = propagator.size
+    for cell, num in enumerate(propagator.values):
+        if num != 0:
+            grid[cell // size][cell % size] = num
+    return grid
@@ -0,0 +1,338 @@
+"""
+Dancing Links (Algorithm X) solver
+The board is encoded as an exact cover problem: 324 constraints (every cell filled, and
+every number once per row, col and box) by 729 choices (a number in a cell) for a 9x9 board,
+4n^2 constraints by n^3 choices for an n x n board.
+The links are kept in flat lists instead of node objects to keep it quick in python
+Nothing to run here :)
+"""
+
+from search_stats import SearchStats
+import sudoku_tools as sutils
+from itertools import islice
+from functools import lru_cache
+import time
+
+CHECK_EVERY = 64 # nodes between deadline checks
+
+
+def choice_constraints(row: int, col: int, num: int, box_size: int=3) -> tuple:
+    """Get the 4 constraints covered by putting a number in a cell
+
+    Args:
+        row (int): index of row
+        col (int): index of col
+        num (int): the number (1-9, or 1-n)
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        tuple: the column indices of the constraints in the exact cover matrix
+    """
+    size = box_size * box_size
+    num_cells = size * size
+    box = box_size * (row // box_size) + col // box_size
+    return (row * size + col,
+            num_cells + row * size + num - 1,
+            2 * num_cells + col * size + num - 1,
+            3 * num_cells + box * size + num - 1)
+
+
+@lru_cache(maxsize=None)
+def build_matrix(box_size: int=3) -> tuple:
+    """Build the links for the full (empty board) exact cover matrix, once per board size
+
+    Args:
+        box_size (int, optional): size of the boxes, 3 for a 9x9 board. Defaults to 3.
+
+    Returns:
+        tuple: the left, right, up, down, column and choice lists for every node,
+        the size of every column, and the first node of every choice
+    """
+    size = box_size * box_size
+    num_cols = 4 * size * size
+    # node 0 is the root, nodes 1-num_cols are the column headers
+    num_headers = num_cols + 1
+    left = [i - 1 for i in range(num_headers)]
+    right = [i + 1 for i in range(num_headers)]
+    left[0] = num_cols
+    right[num_cols] = 0
+    up = list(range(num_headers))
+    down = list(range(num_headers))
+    column = list(range(num_headers))
+    choice = [-1] * num_headers
+    col_size = [0] * num_headers
+    first_node = []
+
+    for row in range(size):
+        for col in range(size):
+            for num in range(1, size + 1):
+                choice_id = (row * size + col) * size + num - 1
+                start = len(left)
+                first_node.append(start)
+                for k, constraint in enumerate(choice_constraints(row, col, num, box_size)):
+                    node = start + k
+                    header = constraint + 1
+                    # link into the row (circular)
+                    left.append(start + (k - 1) % 4)
+                    right.append(start + (k + 1) % 4)
+                    # link at the bottom of the column
+                    up.append(up[header])
+                    down.append(header)
+                    down[up[header]] = node
+                    up[header] = node
+                    column.append(header)
+                    choice.append(choice_id)
+                    col_size[header] += 1
+
+    return left, right, up, down, column, choice, col_size, first_node
+
+
+class DancingLinks():
+    def __init__(self, board: list, collect_stats: bool=False, max_nodes: int=None, time_limit: float=None):
+        """
+        Args:
+            board (list): a 2d list of ints (or a sutils.Board) representing the board, 0 for empty.
+                Any n^2 x n^2 size works
+            collect_stats (bool, optional): fill in self.stats while solving. Defaults to False.
+            max_nodes (int, optional): node budget used by solve(). Defaults to None (no limit).
+            time_limit (float, optional): seconds solve() may run for. Defaults to None (no limit).
+        """
+        self.board = board
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.deadline = None # time.monotonic() value search() stops at
+        self.nodes = 0
+        self.budget_exhausted = False # set when search() stopped on max_nodes or time_limit
+        self.stats = SearchStats() if collect_stats else None
+        self.board_size = len(board)
+        self.box_size = sutils.get_box_size(self.board_size)
+        # the empty board matrix is built once per board size and copied by every solver
+        left, right, up, down, column, choice, size, first_node = build_matrix(self.box_size)
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.size = size[:]
+        self.column = column # never changes
+        self.choice = choice
+        self.solution = [] # chosen rows of the matrix
+        self.consistent = True # False if the givens already break a rule
+
+        n = self.board_size
+        covered = set()
+        for i in range(n):
+            for j in range(n):
+                num = board[i][j]
+                if num == 0:
+                    continue
+                node = first_node[(i * n + j) * n + num - 1]
+                constraints = choice_constraints(i, j, num, self.box_size)
+                if covered.intersection(constraints):
+                    self.consistent = False
+                    continue
+                covered.update(constraints)
+                # select the given: cover each of its 4 columns
+                for k in range(4):
+                    self.cover(self.column[node + k])
+
+    def cover(self, header: int):
+        """Remove a column and every row that has a node in it
+
+        Args:
+            header (int): the column header node
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, header: int):
+        """Put back a column removed by cover, in the reverse order
+
+        Args:
+            header (int): the column header node
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def choose_column(self) -> int:
+        """Get the uncovered column with the fewest rows left
+
+        Returns:
+            int: the column header node, None if every column is covered
+        """
+        right, size = self.right, self.size
+        best = None
+        min_size = len(self.choice)
+        header = right[0]
+        while header != 0:
+            if size[header] < min_size:
+                min_size = size[header]
+                best = header
+                if min_size <= 1:
+                    break
+            header = right[header]
+        return best
+
+    def search(self) -> bool:
+        """Algorithm X over the remaining columns
+
+        Returns:
+            bool: if an exact cover was found
+        """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        header = self.choose_column()
+        if stats is not None:
+            stats.add_time('selection', time.perf_counter() - start)
+        if header is None:
+            return True # every constraint satisfied
+        if self.size[header] == 0:
+            return False # dead end
+
+        right, left, down, column = self.right, self.left, self.down, self.column
+        self.cover(header)
+        num_options = self.size[header]
+        i = down[header]
+        while i != header:
+            self.solution.append(self.choice[i])
+            self.nodes += 1
+            if stats is not None:
+                stats.record_node(len(self.solution), num_options)
+            j = right[i]
+            while j != i:
+                self.cover(column[j])
+                j = right[j]
+
+            out_of_nodes = self.max_nodes is not None and self.nodes >= self.max_nodes
+            out_of_time = self.deadline is not None and self.nodes % CHECK_EVERY == 0 and time.monotonic() >= self.deadline
+            if out_of_nodes or out_of_time:
+                self.budget_exhausted = True
+            elif self.search(): # recursive call
+                return True
+
+            self.solution.pop() # backtrack
+            if stats is not None:
+                stats.backtracks += 1
+            j = left[i]
+            while j != i:
+                self.uncover(column[j])
+                j = left[j]
+            if self.budget_exhausted:
+                break # unwind without trying the other rows
+            i = down[i]
+        self.uncover(header)
+        return False
+
+    def iter_search(self):
+        """Algorithm X as a generator, yielding every exact cover
+
+        Yields:
+            list: the chosen rows of each cover
+        """
+        header = self.choose_column()
+        if header is None:
+            yield self.solution[:]
+            return
+        if self.size[header] == 0:
+            return # dead end
+
+        right, left, down, column = self.right, self.left, self.down, self.column
+        self.cover(header)
+        try:
+            i = down[header]
+            while i != header:
+                self.solution.append(self.choice[i])
+                j = right[i]
+                while j != i:
+                    self.cover(column[j])
+                    j = right[j]
+                try:
+                    yield from self.iter_search() # recursive call
+                finally:
+                    # backtrack, even if the caller stops early
+                    self.solution.pop()
+                    j = left[i]
+                    while j != i:
+                        self.uncover(column[j])
+                        j = left[j]
+                i = down[i]
+        finally:
+            self.uncover(header)
+
+    def choices_to_board(self, choices: list) -> list:
+        """Turn chosen rows of the matrix into a filled board
+
+        Args:
+            choices (list): the chosen rows
+
+        Returns:
+            list: a new 2d array with the givens and the choices filled in
+        """
+        n = self.board_size
+        board = [list(row) for row in self.board]
+        for choice_id in choices:
+            cell, num = divmod(choice_id, n)
+            board[cell // n][cell % n] = num + 1
+        return board
+
+    def iter_solutions(self):
+        """Go through every solution of the given sudoku
+
+        Yields:
+            list: each solved board as a new 2d array
+        """
+        if not self.consistent:
+            return
+        for choices in self.iter_search():
+            yield self.choices_to_board(choices)
+
+    def count_solutions(self, limit: int=2) -> int:
+        """Count the solutions, stopping as soon as limit is reached
+        (limit=2 is enough to check that a puzzle has exactly one solution)
+
+        Args:
+            limit (int, optional): the most solutions to look for. Defaults to 2.
+
+        Returns:
+            int: the number of solutions found, at most limit
+        """
+        return sum(1 for _ in islice(self.iter_solutions(), limit))
+
+    def solve(self) -> list:
+        """solve the given sudoku within the node and time limits given to the constructor
+
+        Returns:
+            list: the solved board as a 2d array, None if unsolvable or a limit was hit
+                (self.budget_exhausted tells them apart)
+        """
+        self.deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        self.nodes = 0
+        self.budget_exhausted = self.max_nodes is not None and self.max_nodes <= 0 # no nodes to spend
+        if not self.consistent or self.budget_exhausted or not self.search():
+            return None # unsolved
+
+        n = self.board_size
+        for choice_id in self.solution:
+            cell, num = divmod(choice_id, n)
+            self.board[cell // n][cell % n] = num + 1
+        return self.board
@@ -1,23 +1,29 @@
 import numpy as np
+from math import isqrt
 
 
 # -------------------- Fitness functions --------------------
 
 # ideas: avg row/col/box sum, # conflicts in each row/col/box
+# boards can be any n^2 x n^2 size, n = arr.shape[0] and the boxes are isqrt(n) wide
 def row_conflicts(arr):
-    return np.sum(9 - np.apply_along_axis(lambda row: len(np.unique(row)), axis=1, arr=arr))
+    n = arr.shape[0]
+    return np.sum(n - np.apply_along_axis(lambda row: len(np.unique(row)), axis=1, arr=arr))
 
 
 def col_conflicts(arr):
-    return np.sum(9 - np.apply_along_axis(lambda col: len(np.unique(col)), axis=0, arr=arr))
+    n = arr.shape[0]
+    return np.sum(n - np.apply_along_axis(lambda col: len(np.unique(col)), axis=0, arr=arr))
 
 
 def box_conflicts(arr):
+    n = arr.shape[0]
+    b = isqrt(n)
     conflicts = 0
-    for i in range(3):
-        for j in range(3):
-            block = arr[i*3:(i+1)*3, j*3:(j+1)*3].flatten()
-            conflicts += 9 - len(np.unique(block))
+    for i in range(b):
+        for j in range(b):
+            block = arr[i*b:(i+1)*b, j*b:(j+1)*b].flatten()
+            conflicts += n - len(np.unique(block))
     return conflicts
 
 
@@ -25,56 +31,303 @@ def total_conflicts(arr):
     return row_conflicts(arr) + col_conflicts(arr) + box_conflicts(arr)
 
 
+# batch versions, score a whole (P, n, n) population at once with one-hot counts of each
+# digit per row/col/box. Same results as the functions above for full boards
+
+def one_hot(pop):
+    n = pop.shape[1]
+    return pop[..., None] == np.arange(1, n + 1)   # (P, n, n, n) bool, [p, r, c, d-1]
+
+
+def unit_conflicts(counts):
+    ''' counts: (P, units, n) digit counts, conflicts = n - number of different digits '''
+    n = counts.shape[-1]
+    return n - (counts > 0).sum(axis=-1)
+
+
+def row_conflicts_batch(pop, hot=None):
+    hot = one_hot(pop) if hot is None else hot
+    return unit_conflicts(hot.sum(axis=2)).sum(axis=1)
+
+
+def col_conflicts_batch(pop, hot=None):
+    hot = one_hot(pop) if hot is None else hot
+    return unit_conflicts(hot.sum(axis=1)).sum(axis=1)
+
+
+def box_conflicts_batch(pop, hot=None):
+    hot = one_hot(pop) if hot is None else hot
+    p, n = hot.shape[:2]
+    b = isqrt(n)
+    counts = hot.reshape(p, b, b, b, b, n).sum(axis=(2, 4))   # (P, b, b, n) per box
+    return unit_conflicts(counts.reshape(p, n, n)).sum(axis=1)
+
+
+def total_conflicts_batch(pop, hot=None):
+    hot = one_hot(pop) if hot is None else hot
+    return row_conflicts_batch(pop, hot) + col_conflicts_batch(pop, hot) + box_conflicts_batch(pop, hot)
+
+
+def conflicting_cells(arr):
+    ''' (n, n) bool, True where a full board's digit is repeated in the cell's row, col or box '''
+    n = arr.shape[0]
+    b = isqrt(n)
+    hot = one_hot(arr[None])[0]     # [r, c, d-1]
+    rows, cols = np.indices(arr.shape)
+    digits = arr - 1
+    return ((hot.sum(axis=1)[rows, digits] > 1)
+            | (hot.sum(axis=0)[cols, digits] > 1)
+            | (hot.reshape(b, b, b, b, n).sum(axis=(1, 3))[rows // b, cols // b, digits] > 1))
+
+
+# per board function: its batch version, used by SudokuGeneticAlgorithm when scoring a population
+BATCH_FITNESS = {row_conflicts: row_conflicts_batch,
+                 col_conflicts: col_conflicts_batch,
+                 box_conflicts: box_conflicts_batch,
+                 total_conflicts: total_conflicts_batch}
+
+
+# incremental version, for agents that try many small moves on one board
+
+class ConflictTables:
+    ''' Digit counts of every row/col/box of a full board, so the change in total conflicts
+    from changing or swapping cells is found from the 3 units each cell is in '''
+    __slots__ = ('n', 'b', 'rows', 'cols', 'boxes', 'conflicts')
+
+    def __init__(self, arr):
+        self.n = arr.shape[0]
+        self.b = isqrt(self.n)
+        self.rows = [[0] * (self.n + 1) for _ in range(self.n)]
+        self.cols = [[0] * (self.n + 1) for _ in range(self.n)]
+        self.boxes = [[0] * (self.n + 1) for _ in range(self.n)]
+        for r, row in enumerate(arr.tolist()):
+            for c, num in enumerate(row):
+                self.rows[r][num] += 1
+                self.cols[c][num] += 1
+                self.boxes[(r // self.b) * self.b + c // self.b][num] += 1
+        # a unit with n cells has n - (different digits) conflicts, the sum of (count - 1) over its digits
+        self.conflicts = sum(count - 1 for units in (self.rows, self.cols, self.boxes)
+                             for unit in units for count in unit if count > 1)
+
+    def move(self, r, c, old, new):
+        ''' Update the counts for cell (r, c) changing from old to new, return the change in conflicts '''
+        delta = 0
+        for unit in (self.rows[r], self.cols[c], self.boxes[(r // self.b) * self.b + c // self.b]):
+            unit[old] -= 1
+            if unit[old] > 0:
+                delta -= 1
+            if unit[new] > 0:
+                delta += 1
+            unit[new] += 1
+        self.conflicts += delta
+        return delta
+
+    def change(self, arr, idx, num):
+        ''' Set arr[idx] = num, return the change in conflicts '''
+        r, c = int(idx[0]), int(idx[1])
+        old = int(arr[r, c])
+        arr[r, c] = num
+        return self.move(r, c, old, int(num))
+
+    def swap(self, arr, idx1, idx2):
+        ''' Swap two cells of arr, return the change in conflicts '''
+        r1, c1, r2, c2 = int(idx1[0]), int(idx1[1]), int(idx2[0]), int(idx2[1])
+        num1, num2 = int(arr[r1, c1]), int(arr[r2, c2])
+        arr[r1, c1], arr[r2, c2] = num2, num1
+        return self.move(r1, c1, num1, num2) + self.move(r2, c2, num2, num1)
+
+
+# mutable positions of a puzzle, indexed once instead of searching the list on every move
+
+class MutableCells:
+    ''' Index tables of the cells the GA may change. Indexing, iterating and `in` work on (r, c)
+    tuples, so it can be passed anywhere the list of mutable positions was '''
+    __slots__ = ('n', 'b', 'mask', 'cells', 'cell_list', 'rows', 'cols', 'boxes',
+                 'row_counts', 'row_table', 'swap_rows')
+
+    def __init__(self, mask):
+        ''' mask: (n, n) bool, True where the cell is mutable (e.g. initial_board == 0) '''
+        self.mask = np.asarray(mask, dtype=bool)
+        self.n = self.mask.shape[0]
+        self.b = isqrt(self.n)
+        self.cells = np.argwhere(self.mask)     # (m, 2) in row major order
+        self.cell_list = [tuple(cell) for cell in self.cells.tolist()]
+        self.rows = [np.flatnonzero(self.mask[r]) for r in range(self.n)]     # mutable cols of each row
+        self.cols = [np.flatnonzero(self.mask[:, c]) for c in range(self.n)]  # mutable rows of each col
+        box_ids = (self.cells[:, 0] // self.b) * self.b + self.cells[:, 1] // self.b
+        self.boxes = [self.cells[box_ids == i] for i in range(self.n)]      # (r, c) pairs of each box
+        # rows as one padded (n, max mutables in a row) table for drawing many cells at once
+        self.row_counts = np.array([len(cols) for cols in self.rows], dtype=np.intp)
+        self.row_table = np.zeros((self.n, max(self.row_counts.max(initial=0), 1)), dtype=np.intp)
+        for r, cols in enumerate(self.rows):
+            self.row_table[r, :len(cols)] = cols
+        self.swap_rows = np.flatnonzero(self.row_counts >= 2)    # rows with something to swap
+
+    @classmethod
+    def of(cls, mutable, n):
+        ''' mutable as MutableCells, building the tables from a list of (r, c) if needed '''
+        if isinstance(mutable, cls):
+            return mutable
+        mask = np.zeros((n, n), dtype=bool)
+        for r, c in mutable:
+            mask[r, c] = True
+        return cls(mask)
+
+    def __len__(self):
+        return len(self.cell_list)
+
+    def __getitem__(self, idx):
+        return self.cell_list[idx]
+
+    def __iter__(self):
+        return iter(self.cell_list)
+
+    def __contains__(self, cell):
+        return bool(self.mask[cell[0], cell[1]])
+
+
+def randint(rng, low, high, size=None):
+    ''' rng.integers for a np.random.Generator, rng.randint for np.random or a RandomState '''
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, size)
+    return rng.randint(low, high, size)
+
+
+def random_matching(options, rng=np.random):
+    ''' Randomised bipartite matching (augmenting paths, slots and options tried in random order)
+    options: for each slot, the values it can take
+    Return a different value for each slot, None for the slots left out if there is no perfect matching '''
+    slot_of = {}    # value: slot it is matched to
+
+    def augment(slot, seen):
+        for value in rng.permutation(options[slot]).tolist():
+            if value in seen:
+                continue
+            seen.add(value)
+            if value not in slot_of or augment(slot_of[value], seen):
+                slot_of[value] = slot
+                return True
+        return False
+
+    for slot in rng.permutation(len(options)).tolist():
+        augment(slot, set())
+    matching = [None] * len(options)
+    for value, slot in slot_of.items():
+        matching[slot] = value
+    return matching
+
+
+# ------------------- Selection functions -------------------
+
+# each picks parents for a whole generation at once: it takes the conflicts of the candidates
+# and the shape of the draw, e.g. (offspring_n, 2), and returns indices into conflicts.
+# rng is np.random or a np.random.Generator, only rng.random is used so both work
+
+def alias_table(weights):
+    ''' Vose's alias table for drawing from weights (any scale) in O(1) per draw '''
+    n = len(weights)
+    prob = np.asarray(weights, dtype=float) * (n / np.sum(weights))
+    alias = np.zeros(n, dtype=np.intp)
+    small = [i for i in range(n) if prob[i] < 1]
+    large = [i for i in range(n) if prob[i] >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        alias[s] = l
+        prob[l] -= 1 - prob[s]
+        (small if prob[l] < 1 else large).append(l)
+    prob[small + large] = 1     # only rounding error left
+    return prob, alias
+
+
+def alias_draw(prob, alias, size, rng=np.random):
+    ''' Draw indices from an alias table '''
+    idx = (rng.random(size) * len(prob)).astype(np.intp)
+    return np.where(rng.random(size) < prob[idx], idx, alias[idx])
+
+
+def roulette_selection(conflicts, size, rng=np.random):
+    ''' Fitness proportional, weight 1/conflicts (a solved board counts as 1 conflict) '''
+    return alias_draw(*alias_table(1 / np.maximum(conflicts, 1)), size, rng)
+
+
+def tournament_selection(conflicts, size, tournament_size=3, rng=np.random):
+    ''' Best of tournament_size candidates picked uniformly, for each parent '''
+    shape = np.shape(np.empty(size, dtype=bool)) + (tournament_size,)
+    entrants = (rng.random(shape) * len(conflicts)).astype(np.intp)
+    winners = np.argmin(np.asarray(conflicts)[entrants], axis=-1)
+    return np.take_along_axis(entrants, winners[..., None], axis=-1)[..., 0]
+
+
+def rank_selection(conflicts, size, pressure=1.5, rng=np.random):
+    ''' Linear ranking, the best gets pressure (1 to 2) times the mean weight and the worst 2 - pressure '''
+    n = len(conflicts)
+    ranks = np.empty(n)
+    ranks[np.argsort(conflicts, kind='stable')] = np.arange(n)[::-1]   # best has rank n - 1
+    weights = 2 - pressure + 2 * (pressure - 1) * ranks / max(n - 1, 1)
+    return alias_draw(*alias_table(weights), size, rng)
+
+
+SELECTION = {'roulette': roulette_selection,
+             'tournament': tournament_selection,
+             'rank': rank_selection}
+
+
 # --------------------- Agent functions ---------------------
 
 # ideas: randomly swap any two values, randomly change a value,
 # replace duplicate value with random number, if row/col sum > correct --> np.min(rand_idx, rand_idx-1)
 
+# mutable is a MutableCells or a list of (r, c) positions
+
 def shuffle_row(arr, mutable, k=1):
+    cells = MutableCells.of(mutable, arr.shape[0])
+    if len(cells.swap_rows) == 0:
+        return arr
     for i in range(k):
-        row_idx = np.random.randint(0, 9)
-        row_mutables = np.array([col for (r, col) in mutable if r == row_idx])
-        col1, col2 = np.random.choice(row_mutables, 2, replace=False)
+        row_idx = cells.swap_rows[np.random.randint(0, len(cells.swap_rows))]
+        col1, col2 = np.random.choice(cells.rows[row_idx], 2, replace=False)
         arr[row_idx, col1], arr[row_idx, col2] = arr[row_idx, col2], arr[row_idx, col1]
     return arr
 
 
-def greedy_shuffle_row(arr, mutable, k=1):
+# the greedy agents score their moves with ConflictTables instead of recounting the board,
+# a move that makes things worse is undone 90% of the time
+
+def greedy_shuffle_row(arr, mutable, k=1, tables=None):
+    cells = MutableCells.of(mutable, arr.shape[0])
+    if len(cells.swap_rows) == 0:
+        return arr
+    tables = tables or ConflictTables(arr)
     for i in range(k*5):
-        num_conflicts = total_conflicts(arr)
-        row_idx = np.random.randint(0, 9)
-        row_mutables = np.array([col for (r, col) in mutable if r == row_idx])
-        col1, col2 = np.random.choice(row_mutables, 2, replace=False)
-        arr[row_idx, col1], arr[row_idx, col2] = arr[row_idx, col2], arr[row_idx, col1]
-        if total_conflicts(arr) > num_conflicts:
+        row_idx = cells.swap_rows[np.random.randint(0, len(cells.swap_rows))]
+        col1, col2 = np.random.choice(cells.rows[row_idx], 2, replace=False)
+        if tables.swap(arr, (row_idx, col1), (row_idx, col2)) > 0:
             rnd = np.random.randn()
             if rnd < 0.9:
-                arr[row_idx, col1], arr[row_idx, col2] = arr[row_idx, col2], arr[row_idx, col1]
+                tables.swap(arr, (row_idx, col1), (row_idx, col2))
     return arr
 
 
-def greedy_swap(arr, mutable, k=1):
+def greedy_swap(arr, mutable, k=1, tables=None):
+    tables = tables or ConflictTables(arr)
     for i in range(k):
-        num_conflicts = total_conflicts(arr)
         idx1, idx2 = [mutable[idx] for idx in np.random.choice(len(mutable), 2, replace=False)]
-        arr[idx1], arr[idx2] = arr[idx2], arr[idx1]
-        if total_conflicts(arr) > num_conflicts:
+        if tables.swap(arr, idx1, idx2) > 0:
             rnd = np.random.randn()
             if rnd < 0.9:
-                arr[idx1], arr[idx2] = arr[idx2], arr[idx1]
+                tables.swap(arr, idx1, idx2)
     return arr
 
 
-def greedy_change(arr, mutable, k=1):
+def greedy_change(arr, mutable, k=1, tables=None):
+    tables = tables or ConflictTables(arr)
     for i in range(10):
-        num_conflicts = total_conflicts(arr)
         idx = mutable[np.random.choice(len(mutable), 1).item()]
         original = arr[idx]
-        arr[idx] = np.random.randint(1, 10)
-        if total_conflicts(arr) > num_conflicts:
+        if tables.change(arr, idx, np.random.randint(1, arr.shape[0] + 1)) > 0:
             rnd = np.random.randn()
             if rnd < 0.9:
-                arr[idx] = original
+                tables.change(arr, idx, original)
     return arr
 
 
@@ -86,65 +339,71 @@ def random_swap(arr, mutable, k=1):
 
 def random_change(arr, mutable, k=1):
     idx = mutable[np.random.choice(len(mutable), 1).item()]
-    arr[idx] = np.random.randint(1, 10)
+    arr[idx] = np.random.randint(1, arr.shape[0] + 1)
     return arr
 
 
 def replace_dup_rows(arr, mutable, k=1):
-    for row_idx in range(9):
+    n = arr.shape[0]
+    cells = MutableCells.of(mutable, n)
+    for row_idx in range(n):
         row = arr[row_idx]
-        row_mutables = np.array([col for (r, col) in mutable if r == row_idx])
+        row_mutables = cells.rows[row_idx]
         included, counts = np.unique(row, return_counts=True)
-        if len(included) == 9:
+        if len(included) == n:
             continue
 
         duplicates = included[counts > 1]
         dup_mutable_idx = row_mutables[np.isin(row[row_mutables], duplicates)]
 
         duplicate_idx = np.random.choice(dup_mutable_idx)
-        excluded_val = np.random.choice(np.setdiff1d(np.arange(1, 10), included))
+        excluded_val = np.random.choice(np.setdiff1d(np.arange(1, n + 1), included))
 
         arr[row_idx, duplicate_idx] = excluded_val
     return arr
 
 
 def replace_dup_cols(arr, mutable, k=1):
-    for col_idx in range(9):
+    n = arr.shape[0]
+    cells = MutableCells.of(mutable, n)
+    for col_idx in range(n):
         col = arr[:, col_idx]
-        col_mutables = np.array([row for (row, c) in mutable if c == col_idx])
+        col_mutables = cells.cols[col_idx]
         included, counts = np.unique(col, return_counts=True)
 
-        if len(included) == 9:
+        if len(included) == n:
             continue
 
         duplicates = included[counts > 1]
         dup_mutable_idx = col_mutables[np.isin(col[col_mutables], duplicates)]
 
         duplicate_idx = np.random.choice(dup_mutable_idx)
-        excluded_val = np.random.choice(np.setdiff1d(np.arange(1, 10), included))
+        excluded_val = np.random.choice(np.setdiff1d(np.arange(1, n + 1), included))
 
         arr[duplicate_idx, col_idx] = excluded_val
     return arr
 
 
 def replace_dup_boxes(arr, mutable, k=1):
-    for box_row in range(3):
-        for box_col in range(3):
-            box_start_row, box_start_col = box_row * 3, box_col * 3
-            box_values = arr[box_start_row:box_start_row + 3, box_start_col:box_start_col + 3]
+    n = arr.shape[0]
+    b = isqrt(n)
+    cells = MutableCells.of(mutable, n)
+    for box_row in range(b):
+        for box_col in range(b):
+            box_start_row, box_start_col = box_row * b, box_col * b
+            box_values = arr[box_start_row:box_start_row + b, box_start_col:box_start_col + b]
 
-            box_mutables = [(r, c) for (r, c) in mutable if
-                            box_start_row <= r < box_start_row + 3 and box_start_col <= c < box_start_col + 3]
+            box_mutables = cells.boxes[box_row * b + box_col]
 
             included, counts = np.unique(box_values, return_counts=True)
-            if len(included) == 9:
+            if len(included) == n:
                 continue
 
             duplicates = included[counts > 1]
-            dup_mutable_idx = [(r, c) for (r, c) in box_mutables if arr[r, c] in duplicates]
+            dup_mutable_idx = box_mutables[np.isin(arr[box_mutables[:, 0], box_mutables[:, 1]], duplicates)]
 
-            duplicate_idx = dup_mutable_idx[np.random.choice(len(dup_mutable_idx))]
-            excluded_val = np.random.choice(np.setdiff1d(np.arange(1, 10), included))
+            duplicate_idx = tuple(dup_mutable_idx[np.random.choice(len(dup_mutable_idx))])
+            excluded_val = np.random.choice(np.setdiff1d(np.arange(1, n + 1), included))
 
             arr[duplicate_idx] = excluded_val
 
@@ -152,18 +411,131 @@ def replace_dup_boxes(arr, mutable, k=1):
 
 
 def shuffle_boxes(arr, mutable, k=1):
+    b = isqrt(arr.shape[0])
+    cells = MutableCells.of(mutable, arr.shape[0])
     for _ in range(k):
-        i, j = np.random.randint(0, 3, 2)
+        i, j = np.random.randint(0, b, 2)
     # for i in range(3):
     #     for j in range(3):
-        box_indices = [(r, c) for r in range(i*3, (i+1)*3)
-                             for c in range(j*3, (j+1)*3)
-                             if (r, c) in mutable]
-        values = [arr[r, c] for (r, c) in box_indices]
+        box_rows, box_cols = cells.boxes[i*b + j].T
+        values = arr[box_rows, box_cols]
         if len(values) > 1:
             np.random.shuffle(values)
-            for (r, c), val in zip(box_indices, values):
-                arr[r, c] = val
+            arr[box_rows, box_cols] = values
     return arr
 
+
+# ------------------ Batch agent functions ------------------
+
+# operators on a whole (P, n, n) offspring array at once, with the random draws for every board
+# made together. cells is a MutableCells, k the number of moves for each board (an int or a (P,)
+# array, 0 leaves a board alone) and rng is np.random or a np.random.Generator
+
+def crossover_batch(parents1, parents2, out=None, rng=np.random):
+    ''' Row-wise crossover of each pair, the rows before a random point come from parents1 '''
+    p, n = parents1.shape[:2]
+    points = (rng.random(p) * n).astype(np.intp)
+    from_first = np.arange(n) < points[:, None]     # (P, n) rows taken from parents1
+    if out is None:
+        out = np.empty_like(parents1)
+    np.copyto(out, np.where(from_first[..., None], parents1, parents2))
+    return out
+
+
+def draw_row_swaps(cells, size, rng=np.random):
+    ''' A random row and two different mutable cols in it, for each of size swaps '''
+    rows = cells.swap_rows[(rng.random(size) * len(cells.swap_rows)).astype(np.intp)]
+    counts = cells.row_counts[rows]
+    i1 = (rng.random(size) * counts).astype(np.intp)
+    i2 = (rng.random(size) * (counts - 1)).astype(np.intp)
+    i2 += i2 >= i1
+    return rows, cells.row_table[rows, i1], cells.row_table[rows, i2]
+
+
+def shuffle_row_batch(pop, cells, k, rng=np.random):
+    k = np.broadcast_to(k, len(pop))
+    if len(cells.swap_rows) == 0 or len(pop) == 0:
+        return pop
+    boards = np.arange(len(pop))
+    for t in range(k.max()):
+        active = boards[k > t]
+        rows, cols1, cols2 = draw_row_swaps(cells, len(active), rng)
+        nums1 = pop[active, rows, cols1]
+        pop[active, rows, cols1] = pop[active, rows, cols2]
+        pop[active, rows, cols2] = nums1
+    return pop
+
+
+def greedy_shuffle_row_batch(pop, cells, k, rng=np.random):
+    ''' greedy_shuffle_row for every board, scoring the swaps with col/box digit counts of the whole
+    population (a row swap never changes the row conflicts) '''
+    k = np.broadcast_to(k, len(pop))
+    if len(cells.swap_rows) == 0 or len(pop) == 0:
+        return pop
+    p, n, b = len(pop), cells.n, cells.b
+    hot = one_hot(pop)
+    col_counts = hot.sum(axis=1, dtype=np.int16)     # [p, col, digit - 1]
+    box_counts = hot.reshape(p, b, b, b, b, n).sum(axis=(2, 4), dtype=np.int16).reshape(p, n, n)
+    boards = np.arange(p)
+    for t in range(5 * k.max()):
+        active = boards[5 * k > t]
+        rows, cols1, cols2 = draw_row_swaps(cells, len(active), rng)
+        nums1 = pop[active, rows, cols1].astype(np.intp) - 1
+        nums2 = pop[active, rows, cols2].astype(np.intp) - 1
+        boxes1 = (rows // b) * b + cols1 // b
+        boxes2 = (rows // b) * b + cols2 // b
+        # num1 leaves col1/box1 and num2 joins them, the other way round for col2/box2
+        delta = ((col_counts[active, cols1, nums2] > 0) * 1 - (col_counts[active, cols1, nums1] > 1)
+                 + (col_counts[active, cols2, nums1] > 0) - (col_counts[active, cols2, nums2] > 1))
+        delta += (boxes1 != boxes2) * ((box_counts[active, boxes1, nums2] > 0) * 1
+                                       - (box_counts[active, boxes1, nums1] > 1)
+                                       + (box_counts[active, boxes2, nums1] > 0)
+                                       - (box_counts[active, boxes2, nums2] > 1))
+        # same rule as greedy_shuffle_row, a worse swap is undone when randn < 0.9
+        keep = (nums1 != nums2) & ((delta <= 0) | (rng.standard_normal(len(active)) >= 0.9))
+        active, rows, cols1, cols2 = active[keep], rows[keep], cols1[keep], cols2[keep]
+        nums1, nums2, boxes1, boxes2 = nums1[keep], nums2[keep], boxes1[keep], boxes2[keep]
+        pop[active, rows, cols1] = nums2 + 1
+        pop[active, rows, cols2] = nums1 + 1
+        for counts, units1, units2 in ((col_counts, cols1, cols2), (box_counts, boxes1, boxes2)):
+            # each index is only hit once per board, so plain fancy indexing adds up
+            counts[active, units1, nums1] -= 1
+            counts[active, units1, nums2] += 1
+            counts[active, units2, nums2] -= 1
+            counts[active, units2, nums1] += 1
+    return pop
+
+
+def random_swap_batch(pop, cells, k, rng=np.random):
+    ''' random_swap for every board with k > 0 '''
+    active = np.flatnonzero(np.broadcast_to(k, len(pop)))
+    m = len(cells)
+    if m < 2 or len(active) == 0:
+        return pop
+    i1 = (rng.random(len(active)) * m).astype(np.intp)
+    i2 = (rng.random(len(active)) * (m - 1)).astype(np.intp)
+    i2 += i2 >= i1
+    (rows1, cols1), (rows2, cols2) = cells.cells[i1].T, cells.cells[i2].T
+    nums1 = pop[active, rows1, cols1]
+    pop[active, rows1, cols1] = pop[active, rows2, cols2]
+    pop[active, rows2, cols2] = nums1
+    return pop
+
+
+def random_change_batch(pop, cells, k, rng=np.random):
+    ''' random_change for every board with k > 0 '''
+    active = np.flatnonzero(np.broadcast_to(k, len(pop)))
+    if len(cells) == 0 or len(active) == 0:
+        return pop
+    rows, cols = cells.cells[(rng.random(len(active)) * len(cells)).astype(np.intp)].T
+    pop[active, rows, cols] = (rng.random(len(active)) * cells.n).astype(pop.dtype) + 1
+    return pop
+
+
+# per board agent: its batch version, used by SudokuGeneticAlgorithm when mutating offspring
+BATCH_AGENTS = {shuffle_row: shuffle_row_batch,
+                greedy_shuffle_row: greedy_shuffle_row_batch,
+                random_swap: random_swap_batch,
+                random_change: random_change_batch}
+
 # --------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Parallel search for a single hard puzzle
+The first few levels of the search tree are expanded into a frontier of smaller boards which
+are handed out to worker processes. Workers search in slices of nodes, and when another
+worker is idle they split off their untried branches for it. Everyone stops as soon as one
+worker finds a solution.
+Run this file to compare it against the single process search on the hardest bundled puzzles
+"""
+
+from search_stats import SearchStats
+import constraint_propagation as cprop
+import search_driver as sd
+import sudoku_tools as sutils
+import multiprocessing as mp
+import queue
+import time
+
+
+def expand_frontier(board: list, depth: int=2) -> list:
+    """Branch on the most constrained cell for the first few levels of the search
+
+    Args:
+        board (list): a 2d list of ints representing the board, 0 for empty
+        depth (int, optional): how many levels to expand. Defaults to 2.
+
+    Returns:
+        list: the boards (2d arrays) at the frontier, with propagation applied. Contradictions
+        are dropped, so an empty list means the board can't be solved
+    """
+    frontier = [board]
+    for _ in range(depth):
+        next_frontier = []
+        for sub_board in frontier:
+            propagator = cprop.Propagator(sub_board)
+            if not propagator.consistent or not propagator.propagate():
+                continue
+            cell = propagator.get_most_constrained_cell()
+            if cell is None:
+                next_frontier.append(propagator.to_board()) # already solved
+                continue
+            for num in propagator.get_options(cell):
+                mark = propagator.mark()
+                if propagator.assign(cell, num) and propagator.propagate():
+                    next_frontier.append(propagator.to_board())
+                propagator.undo(mark)
+        frontier = next_frontier
+    return frontier
+
+
+def search_worker(tasks, results, cancel, idle, pending, slice_nodes: int, propagate: bool, stats_queue=None):
+    """Worker process: take boards off the task queue and search them a slice at a time
+
+    Args:
+        tasks (mp.Queue): boards to search, None tells the worker to stop
+        results (mp.Queue): ('solved', board) or ('unsat', None) messages for the main process
+        cancel (mp.Event): set once a solution is found
+        idle (mp.Value): number of workers waiting for a task
+        pending (mp.Value): number of boards that have been queued but not finished
+        slice_nodes (int): nodes to search between checks for idle workers
+        propagate (bool): use constraint propagation in the search
+        stats_queue (mp.Queue, optional): collect stats over every board searched and put them
+            here when the worker stops. Defaults to None (no stats).
+    """
+    stats = SearchStats() if stats_queue is not None else None
+    try:
+        worker_loop(tasks, results, cancel, idle, pending, slice_nodes, propagate, stats)
+    finally:
+        if stats is not None:
+            stats_queue.put(stats)
+
+
+def worker_loop(tasks, results, cancel, idle, pending, slice_nodes: int, propagate: bool, stats: SearchStats):
+    """The loop run by search_worker
+
+    Args:
+        stats (SearchStats): the stats of each board searched are merged into this, None for no stats.
+            The other args are the same as search_worker
+    """
+    is_idle = False
+    while not cancel.is_set():
+        try:
+            board = tasks.get(timeout=0.05)
+        except queue.Empty:
+            if not is_idle:
+                is_idle = True
+                with idle.get_lock():
+                    idle.value += 1
+            continue
+        if board is None:
+            break
+        if is_idle:
+            is_idle = False
+            with idle.get_lock():
+                idle.value -= 1
+
+        search = sd.IterativeSearch(board, propagate=propagate, collect_stats=stats is not None)
+        try:
+            while True:
+                result = search.run(max_nodes=slice_nodes, cancel=cancel)
+                if result.status == sd.SOLVED:
+                    cancel.set()
+                    results.put(('solved', result.board))
+                    return
+                if result.status == sd.CANCELLED:
+                    return
+                if result.status == sd.UNSAT:
+                    with pending.get_lock():
+                        pending.value -= 1
+                        if pending.value == 0:
+                            results.put(('unsat', None)) # every board has been searched
+                    break
+                # out of nodes for this slice, give away work if someone is waiting for it
+                if idle.value > 0:
+                    boards = search.split()
+                    if boards:
+                        with pending.get_lock():
+                            pending.value += len(boards)
+                        for sub_board in boards:
+                            tasks.put(sub_board)
+        finally:
+            if stats is not None:
+                stats.merge(search.stats)
+
+
+class ParallelSearch():
+    def __init__(self, board: list, processes: int=None, frontier_depth: int=2,
+                 slice_nodes: int=500, propagate: bool=True, timeout: float=None, collect_stats: bool=False):
+        """
+        Args:
+            board (list): a 2d list of ints (or a sutils.Board) representing the board, 0 for empty
+            processes (int, optional): number of worker processes. Defaults to None (all cores).
+            frontier_depth (int, optional): search levels to expand before handing out work. Defaults to 2.
+            slice_nodes (int, optional): nodes a worker searches between checks for idle workers. Defaults to 500.
+            propagate (bool, optional): use constraint propagation in the workers. Defaults to True.
+            timeout (float, optional): seconds to wait for the workers. Defaults to None (no limit).
+            collect_stats (bool, optional): fill in self.stats with the stats of every worker merged. Defaults to False.
+        """
+        self.board = board
+        self.processes = processes or mp.cpu_count()
+        self.frontier_depth = frontier_depth
+        self.slice_nodes = slice_nodes
+        self.propagate = propagate
+        self.timeout = timeout
+        self.stats = SearchStats() if collect_stats else None
+
+    def solve(self) -> list:
+        """solve the given sudoku with a pool of worker processes
+
+        Returns:
+            list: the solved board as a 2d array, None if unsolvable (or the timeout was hit)
+
+        Raises:
+            RuntimeError: if a worker process dies before a result is found
+        """
+        frontier = expand_frontier(self.board, depth=self.frontier_depth)
+        if not frontier:
+            return None
+        for sub_board in frontier:
+            if all(all(row) for row in sub_board):
+                return self.fill_board(sub_board)
+
+        tasks = mp.Queue()
+        results = mp.Queue()
+        cancel = mp.Event()
+        idle = mp.Value('i', 0)
+        pending = mp.Value('i', len(frontier))
+        stats_queue = mp.Queue() if self.stats is not None else None
+        for sub_board in frontier:
+            tasks.put(sub_board)
+
+        workers = [mp.Process(target=search_worker,
+                              args=(tasks, results, cancel, idle, pending, self.slice_nodes, self.propagate, stats_queue))
+                   for _ in range(self.processes)]
+        for worker in workers:
+            worker.start()
+
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        status, solution = 'timeout', None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                wait = 1 if deadline is None else min(1, max(deadline - time.monotonic(), 0))
+                try:
+                    status, solution = results.get(timeout=wait)
+                    break
+                except queue.Empty:
+                    # workers only stop on their own after posting a result, so one that has
+                    # stopped without one died and its boards will never be finished
+                    stopped = sum(not worker.is_alive() for worker in workers)
+                    if stopped and results.empty():
+                        raise RuntimeError(f'{stopped} search workers stopped without a result')
+        finally:
+            # stop everyone
+            cancel.set()
+            if stats_queue is not None:
+                self.collect_worker_stats(stats_queue, len(workers))
+            for worker in workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+
+        if status != 'solved':
+            return None
+        return self.fill_board(solution)
+
+    def collect_worker_stats(self, stats_queue, num_workers: int):
+        """Merge the stats each worker puts on stats_queue as it stops into self.stats
+
+        Args:
+            stats_queue (mp.Queue): the queue given to the workers
+            num_workers (int): number of workers to wait for
+        """
+        for _ in range(num_workers):
+            try:
+                self.stats.merge(stats_queue.get(timeout=1))
+            except queue.Empty:
+                break # a worker that doesn't stop in time gets terminated without its stats
+
+    def fill_board(self, solution: list) -> list:
+        """Copy a solution into the board given to the constructor
+
+        Args:
+            solution (list): the solved 2d array
+
+        Returns:
+            list: the board
+        """
+        for i, row in enumerate(solution):
+            for j, num in enumerate(row):
+                self.board[i][j] = num
+        return self.board
+
+
+def main():
+    import pandas as pd
+    df = pd.read_csv('sudoku_datasets/sudoku_hard.csv', dtype=str)
+    df['difficulty'] = df['difficulty'].astype(float)
+    for puzzle, solution in zip(*df.nlargest(3, 'difficulty')[['puzzle', 'solution']].T.values):
+        board = sutils.Board.from_string(puzzle)
+
+        start_time = time.perf_counter()
+        single = sd.IterativeSearch(board.copy(), propagate=True).solve()
+        single_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        parallel = ParallelSearch(board.copy()).solve()
+        parallel_time = time.perf_counter() - start_time
+
+        correct = [sutils.Board.from_array(sol).to_string() == solution for sol in (single, parallel)]
+        print(f'single: {single_time:.4f}s, parallel: {parallel_time:.4f}s, correct: {correct}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Binary puzzle store
+The csv datasets (and the 3 million puzzle Kaggle zip from data_preprocess.ipynb) are compiled
+once into a folder of flat binary files: puzzles and solutions as one byte per cell, plus the
+difficulty ratings, clue counts and sorted indexes on both. The files are memory mapped, so
+opening the store reads nothing, and sampling by difficulty or clue range is a slice of an
+index followed by reading just the chosen rows.
+Run this file to compile the stores
+"""
+
+import sudoku_tools as sutils
+import numpy as np
+import zipfile
+import json
+import time
+import os
+
+CSV_PATHS = [sutils.EASY_PATH, sutils.MED_PATH, sutils.HARD_PATH]
+KAGGLE_ZIP_PATH = 'sudoku_datasets/3-million-sudoku-puzzles-with-ratings.zip'
+STORE_PATH = 'sudoku_datasets/store' # the bundled csvs, used by sutils.get_test_boards
+FULL_STORE_PATH = 'sudoku_datasets/store_full' # the whole Kaggle archive
+
+# same tiers as data_preprocess.ipynb, lo < difficulty <= hi (None for no bound)
+DIFFICULTY_RANGES = {'easy': (None, 3.0),
+                     'medium': (3.0, 6.0),
+                     'hard': (6.0, None)}
+
+
+def read_chunks(source: str, chunk_size: int=100000):
+    """Read a csv, or the first csv in a zip, a chunk of rows at a time
+
+    Args:
+        source (str): path to a .csv or .zip file
+        chunk_size (int, optional): rows per chunk. Defaults to 100000.
+
+    Yields:
+        pd.DataFrame: the next chunk, with puzzle/solution as strings
+    """
+    import pandas as pd # only needed to compile, and slow to import
+    dtype = {'puzzle': str, 'solution': str, 'difficulty': np.float64}
+    if source.endswith('.zip'):
+        with zipfile.ZipFile(source) as z:
+            csv_name = [name for name in z.namelist() if name.endswith('.csv')][0]
+            with z.open(csv_name) as f:
+                yield from pd.read_csv(f, chunksize=chunk_size, dtype=dtype)
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=dtype)
+
+
+def pack_boards(boards) -> np.ndarray:
+    """Turn the csv file version (strings) of many boards into one byte per cell
+
+    Args:
+        boards: list (or pd.Series) of strings of the same length
+
+    Returns:
+        np.ndarray: (N, cells) uint8 array, 0 for empty
+    """
+    boards = list(boards)
+    raw = ''.join(boards).encode('ascii').translate(sutils.CHAR_VALUES)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(boards), -1)
+
+
+def compile_store(sources: list=CSV_PATHS, path: str=STORE_PATH, chunk_size: int=100000) -> 'PuzzleStore':
+    """Compile csv/zip datasets into a binary store, only one chunk is held in memory at a time
+
+    Args:
+        sources (list, optional): csv or zip files to read. Defaults to the bundled csvs.
+        path (str, optional): folder to write the store to. Defaults to STORE_PATH.
+        chunk_size (int, optional): rows read at a time. Defaults to 100000.
+
+    Returns:
+        PuzzleStore: the compiled store
+    """
+    os.makedirs(path, exist_ok=True)
+    count = 0
+    cells = None
+    difficulties = []
+    clues = []
+    with open(os.path.join(path, 'puzzles.bin'), 'wb') as puzzle_file, \
+         open(os.path.join(path, 'solutions.bin'), 'wb') as solution_file:
+        for source in sources:
+            for chunk in read_chunks(source, chunk_size):
+                puzzles = pack_boards(chunk['puzzle'])
+                solutions = pack_boards(chunk['solution'])
+                if cells is None:
+                    cells = puzzles.shape[1]
+                elif puzzles.shape[1] != cells:
+                    raise ValueError(f'{source} has {puzzles.shape[1]} cell boards, the store has {cells}')
+                puzzle_file.write(puzzles.tobytes())
+                solution_file.write(solutions.tobytes())
+                difficulties.append(chunk['difficulty'].to_numpy(dtype=np.float64))
+                clues.append(np.count_nonzero(puzzles, axis=1).astype(np.uint16))
+                count += len(puzzles)
+
+    difficulty = np.concatenate(difficulties) if difficulties else np.zeros(0, dtype=np.float64)
+    clue_counts = np.concatenate(clues) if clues else np.zeros(0, dtype=np.uint16)
+    # indexes: puzzle ids sorted by difficulty (with the sorted ratings for searchsorted), and
+    # sorted by clues with where each clue count starts
+    difficulty_order = np.argsort(difficulty, kind='stable').astype(np.int64)
+    clue_order = np.argsort(clue_counts, kind='stable').astype(np.int64)
+    clue_offsets = np.concatenate(([0], np.cumsum(np.bincount(clue_counts, minlength=(cells or 0) + 1))))
+    np.save(os.path.join(path, 'difficulty.npy'), difficulty)
+    np.save(os.path.join(path, 'clues.npy'), clue_counts)
+    np.save(os.path.join(path, 'difficulty_order.npy'), difficulty_order)
+    np.save(os.path.join(path, 'difficulty_sorted.npy'), difficulty[difficulty_order])
+    np.save(os.path.join(path, 'clue_order.npy'), clue_order)
+    np.save(os.path.join(path, 'clue_offsets.npy'), clue_offsets)
+
+    # written last, so a store without it is an unfinished compile
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'count': count, 'cells': cells, 'sources': list(sources)}, f)
+    return PuzzleStore(path)
+
+
+def open_store(path: str=STORE_PATH, sources: list=CSV_PATHS) -> 'PuzzleStore':
+    """Open a store, compiling it first if it hasn't been or any source changed since it was
+
+    Args:
+        path (str, optional): folder of the store. Defaults to STORE_PATH.
+        sources (list, optional): what to compile it from if needed. Defaults to the bundled csvs.
+
+    Returns:
+        PuzzleStore: the store
+    """
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return compile_store(sources, path)
+    # meta.json is written last, so a source newer than it was changed after compiling
+    compiled_time = os.path.getmtime(meta_path)
+    if any(os.path.exists(source) and os.path.getmtime(source) > compiled_time for source in sources):
+        return compile_store(sources, path)
+    return PuzzleStore(path)
+
+
+class PuzzleStore():
+    def __init__(self, path: str=STORE_PATH):
+        """
+        Args:
+            path (str, optional): folder written by compile_store. Defaults to STORE_PATH.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.count = meta['count']
+        self.cells = meta['cells']
+        shape = (self.count, self.cells)
+        self.puzzles = np.memmap(os.path.join(path, 'puzzles.bin'), dtype=np.uint8, mode='r', shape=shape)
+        self.solutions = np.memmap(os.path.join(path, 'solutions.bin'), dtype=np.uint8, mode='r', shape=shape)
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        self.difficulty = load('difficulty')
+        self.clues = load('clues')
+        self.difficulty_order = load('difficulty_order')
+        self.difficulty_sorted = load('difficulty_sorted')
+        self.clue_order = load('clue_order')
+        self.clue_offsets = load('clue_offsets')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def select(self, difficulty=None, clues: tuple=None) -> np.ndarray:
+        """Get the ids of the puzzles in a difficulty and/or clue range
+
+        Args:
+            difficulty (optional): 'easy', 'medium', 'hard' or a (lo, hi) range, puzzles with
+                lo < difficulty <= hi are picked and None means no bound. Defaults to None (any).
+            clues (tuple, optional): (lo, hi) range of clue counts, inclusive. Defaults to None (any).
+
+        Returns:
+            np.ndarray: the puzzle ids, sorted
+        """
+        selected = None
+        if difficulty is not None:
+            lo, hi = DIFFICULTY_RANGES[difficulty] if isinstance(difficulty, str) else difficulty
+            start = 0 if lo is None else np.searchsorted(self.difficulty_sorted, lo, side='right')
+            end = self.count if hi is None else np.searchsorted(self.difficulty_sorted, hi, side='right')
+            selected = np.sort(self.difficulty_order[start:end])
+        if clues is not None:
+            lo, hi = clues
+            lo, hi = max(lo, 0), min(hi, len(self.clue_offsets) - 2)
+            by_clues = np.sort(self.clue_order[self.clue_offsets[lo]:self.clue_offsets[hi + 1]]) if lo <= hi \
+                       else np.zeros(0, dtype=np.int64)
+            selected = by_clues if selected is None else np.intersect1d(selected, by_clues, assume_unique=True)
+        if selected is None:
+            selected = np.arange(self.count)
+        return selected
+
+    def sample(self, n: int, difficulty=None, clues: tuple=None, seed: int=None) -> np.ndarray:
+        """Pick puzzle ids at random from a difficulty and/or clue range, the same seed always
+        gives the same puzzles
+
+        Args:
+            n (int): number of puzzles
+            difficulty (optional): see select. Defaults to None.
+            clues (tuple, optional): see select. Defaults to None.
+            seed (int, optional): random seed. Defaults to None.
+
+        Returns:
+            np.ndarray: the puzzle ids, sorted so the rows are read in file order
+        """
+        ids = self.select(difficulty, clues)
+        if n > len(ids):
+            raise ValueError(f'asked for {n} puzzles but only {len(ids)} match')
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(ids, size=n, replace=False))
+
+    def get_board(self, idx: int) -> sutils.Board:
+        return sutils.Board(self.puzzles[idx])
+
+    def get_solution(self, idx: int) -> sutils.Board:
+        return sutils.Board(self.solutions[idx])
+
+    def get_records(self, ids) -> list:
+        """Get everything about some puzzles, in the same format as sutils.get_test_boards
+
+        Args:
+            ids: the puzzle ids
+
+        Returns:
+            list: a dict for each puzzle
+        """
+        ids = np.asarray(ids)
+        puzzles = self.puzzles[ids]
+        solutions = self.solutions[ids]
+        records = []
+        for puzzle, solution, num_clues, difficulty_rating in zip(puzzles, solutions, self.clues[ids],
+                                                                  self.difficulty[ids]):
+            board = sutils.Board(puzzle)
+            records.append({'board': board,
+                            'board_input': board.copy(), # the solvers fill this one in
+                            'solution': sutils.Board(solution),
+                            'num_clues': int(num_clues),
+                            'difficulty_rating': float(difficulty_rating)})
+        return records
+
+
+def main():
+    start_time = time.perf_counter()
+    store = compile_store(CSV_PATHS, STORE_PATH)
+    print(f'compiled {len(store)} puzzles to {STORE_PATH} in {time.perf_counter() - start_time:.2f}s')
+    if os.path.exists(KAGGLE_ZIP_PATH):
+        start_time = time.perf_counter()
+        store = compile_store([KAGGLE_ZIP_PATH], FULL_STORE_PATH)
+        print(f'compiled {len(store)} puzzles to {FULL_STORE_PATH} in {time.perf_counter() - start_time:.2f}s')
+
+    for difficulty in DIFFICULTY_RANGES:
+        start_time = time.perf_counter()
+        records = store.get_records(store.sample(1000, difficulty=difficulty, seed=42))
+        print(f'{difficulty}: sampled {len(records)} boards in {time.perf_counter() - start_time:.4f}s')
+
+
+if __name__ == "__main__":
+    main()
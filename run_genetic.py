@@ -1,17 +1,19 @@
 import numpy as np
-import pandas as pd
 import sudoku_tools as sutils
 import genetic_functions as genutils
 from sudoku_genetic import SudokuGeneticAlgorithm
+from sudoku_annealing import SudokuAnnealing
 import multiprocessing as mp
 
 # -------------------- Simulation --------------------
 
 
-def run_simulation(test_board, generations):
-
-    start = np.array(test_board['board_input'])
-    gen_alg = SudokuGeneticAlgorithm(start)
+def setup_genetic(board, population_n=300, rng=None, use_candidates=True):
+    ''' GA with the objectives and agents used for the simulations, population already generated
+    use_candidates: propagate first and seed the population from the candidates, see seed_candidates '''
+    gen_alg = SudokuGeneticAlgorithm(board, rng=rng)
+    if use_candidates:
+        gen_alg.seed_candidates()
 
     # print(gen_alg.initial_board)
 
@@ -25,25 +27,85 @@ def run_simulation(test_board, generations):
     gen_alg.add_agent('greedy row swap', genutils.greedy_shuffle_row, 0.4)
 
     # CHANGE TO 300
-    gen_alg.generate_samples(300)
+    gen_alg.generate_samples(population_n)
+    return gen_alg
+
+
+def print_summary(summary):
+    ''' One line for SudokuGeneticAlgorithm.summary '''
+    finisher = ' (by the exact finisher)' if summary['finished'] else ''
+    outcome = f"solved in {summary['gens_to_solve']} generations{finisher}" if summary['solved'] \
+              else f"{summary['conflicts']} conflicts left after {summary['generations']} generations"
+    print(f"Simulation finished: {outcome}, {summary['time']:.1f}s, "
+          f"{summary['restarts']} restarts, {summary['hypermutations']} hypermutations")
+
+
+def run_simulation(test_board, generations, finish_conflicts=None):
+    ''' finish_conflicts: hybrid mode, hand near solved boards to the exact solver (see evolve) '''
+    gen_alg = setup_genetic(test_board['board_input'])
 
     # evolve population
     board, conflicts, time = gen_alg.evolve(generations=generations,
                                             offspring_n=300,
-                                            elite_n=10)
+                                            elite_n=10,
+                                            finish_conflicts=finish_conflicts)
 
     evo = gen_alg.evolution
     if len(evo) < generations + 1:
         evo += [evo[-1]] * (generations + 1 - len(evo))
     # print(board)
-    # actual_sol = np.array(sutils.formatted_to_array(test_board['solution']))
+    # actual_sol = np.array(test_board['solution'])
     # print(actual_sol)
     # print(np.where(board == actual_sol, 1, 0))
-    print('Simulation finished')
+    print_summary(gen_alg.summary)
     return [time] + evo
 
 
-def main():
+def run_island_simulation(test_board, generations, num_islands=4, seed=None):
+    ''' Same as run_simulation with one board evolved on num_islands processes, see evolve_islands '''
+    gen_alg = setup_genetic(test_board['board_input'], population_n=0)
+    board, conflicts, time = gen_alg.evolve_islands(num_islands=num_islands,
+                                                    population_n=300,
+                                                    seed=seed,
+                                                    generations=generations,
+                                                    offspring_n=300,
+                                                    elite_n=10)
+
+    evo = gen_alg.evolution
+    if len(evo) < generations + 1:
+        evo += [evo[-1]] * (generations + 1 - len(evo))
+    print_summary(gen_alg.summary)
+    return [time] + evo
+
+
+def run_annealing_simulation(test_board, max_steps=2000000, starts=1):
+    ''' Simulated annealing on the same board as run_simulation, returns [time, conflicts] '''
+    sa = SudokuAnnealing(test_board['board_input'])
+    if starts > 1:
+        board, conflicts, time = sa.anneal_multistart(starts=starts, max_steps=max_steps)
+    else:
+        board, conflicts, time = sa.anneal(max_steps=max_steps)
+    print(f"Annealing finished: {conflicts} conflicts, {sa.summary['steps']} steps, {time:.1f}s")
+    return [time, conflicts]
+
+
+def compare_engines(num_examples=10, generations=500, max_steps=2000000):
+    ''' Run the GA and simulated annealing head to head on the same boards, print solved/time per difficulty '''
+    for diff in ['easy', 'medium', 'hard']:
+        test_boards = sutils.get_test_boards(difficulty=diff, num_examples=num_examples)
+        genetic = []    # [time, conflicts] for each board
+        for tb in test_boards:
+            result = run_simulation(tb, generations)
+            genetic.append([result[0], result[-1]])
+        annealing = [run_annealing_simulation(tb, max_steps) for tb in test_boards]
+        for name, results in [('genetic', genetic), ('annealing', annealing)]:
+            times, conflicts = np.array(results).T
+            print(f'{diff} {name}: {np.sum(conflicts == 0)}/{len(results)} solved, '
+                  f'mean conflicts {conflicts.mean():.1f}, mean time {times.mean():.1f}s')
+
+
+def main(islands=0):
+    ''' islands: evolve each board on this many processes instead of several boards at once (0) '''
     difficulties = ['easy', 'medium', 'hard']
     generations = 500
     evolutions = []
@@ -53,6 +115,10 @@ def main():
         print('---------------'+diff+'---------------')
         test_boards = sutils.get_test_boards(difficulty=diff, num_examples=50)
 
+        if islands:
+            evolutions += [[diff] + run_island_simulation(tb, generations, islands) for tb in test_boards]
+            continue
+
         workers = min(5, mp.cpu_count())
 
         try:
@@ -67,6 +133,7 @@ def main():
             pool.join()
             return
 
+    import pandas as pd # only needed here, and slow to import
     evo_df = pd.DataFrame(evolutions, columns=['Difficulty', 'Time']+list(np.arange(generations+1)))
     evo_df.to_csv(output_csv_path)
 
@@ -0,0 +1,287 @@
+"""
+Non-recursive search driver for the backtracking solver
+The search keeps its own stack of frames so it can stop when it runs out of nodes or
+time, or when it's cancelled, and pick up again later from the same stack.
+Nothing to run here :)
+"""
+
+import backtracking_functions as sb
+from collections import namedtuple
+from itertools import islice
+import time
+
+SOLVED = 'solved'
+UNSAT = 'unsat'
+BUDGET_EXHAUSTED = 'budget_exhausted'
+CANCELLED = 'cancelled'
+
+SearchResult = namedtuple('SearchResult', ['status', 'board', 'nodes'])
+
+CHECK_EVERY = 64 # nodes between deadline/cancellation checks
+
+
+class IterativeSearch():
+    def __init__(self, board: list, cell_selection: str='buckets', propagate: bool=False,
+                 max_nodes: int=None, time_limit: float=None, collect_stats: bool=False):
+        """
+        Args:
+            board (list): a 2d list of ints (or a sutils.Board) representing the board, 0 for empty
+            cell_selection (str, optional): passed to Backtracking. Defaults to 'buckets'.
+            propagate (bool, optional): passed to Backtracking. Defaults to False.
+            max_nodes (int, optional): node budget used by solve(). Defaults to None (no limit).
+            time_limit (float, optional): seconds solve() may run for. Defaults to None (no limit).
+            collect_stats (bool, optional): fill in self.stats while searching. Defaults to False.
+        """
+        self.initial_board = [list(row) for row in board]
+        self.cell_selection = cell_selection
+        self.propagate = propagate
+        self.solver = sb.Backtracking(board, cell_selection=cell_selection, propagate=propagate,
+                                      collect_stats=collect_stats)
+        self.size = self.solver.size
+        self.propagator = self.solver.propagator
+        self.stats = self.solver.stats
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.stack = [] # frames of [cell, options, index of the next option, trail mark]
+        self.nodes = 0
+        self.status = None
+        self.started = False
+        self.enumeration_status = None # status iter_solutions() stopped with
+
+    def get_board(self) -> list:
+        """Get a copy of the board as far as the search has got
+
+        Returns:
+            list: board as a 2d array of ints, 0 for empty
+        """
+        if self.propagator:
+            return self.propagator.to_board()
+        return [list(row) for row in self.solver.board]
+
+    def next_frame(self) -> list:
+        """Pick the next cell to fill and make a frame for it
+
+        Returns:
+            list: the new frame, None if the board is full
+        """
+        if self.propagator:
+            cell = self.propagator.get_most_constrained_cell()
+            if cell is None:
+                return None
+            return [cell, self.propagator.get_options(cell), 0, self.propagator.mark()]
+
+        empty = self.solver.get_most_conflicts_cell()
+        if empty is None:
+            return None
+        row, col = empty
+        return [row * self.size + col, self.solver.get_valid_numbers(row, col), 0, None]
+
+    def undo_frame(self, frame: list):
+        """Take back the option a frame last tried
+
+        Args:
+            frame (list): the frame to undo
+        """
+        if frame[2] == 0:
+            return # nothing tried yet
+        if self.propagator:
+            self.propagator.undo(frame[3])
+        else:
+            row, col = divmod(frame[0], self.size)
+            if self.solver.board[row][col] != 0:
+                self.solver.remove(row, col)
+
+    def try_option(self, frame: list, num: int) -> bool:
+        """Place the number for a frame's cell
+
+        Args:
+            frame (list): the frame to try the number in
+            num (int): the number to place
+
+        Returns:
+            bool: False if the placement leads straight to a contradiction
+        """
+        if self.propagator:
+            return self.propagator.assign(frame[0], num) and self.propagator.propagate()
+        row, col = divmod(frame[0], self.size)
+        self.solver.place(row, col, num)
+        return True
+
+    def start(self) -> bool:
+        """Set up the root of the search
+
+        Returns:
+            bool: False if the board is already known to be unsolvable
+        """
+        self.started = True
+        if not self.solver.consistent:
+            return False
+        if self.propagator and not self.propagator.propagate():
+            return False
+        frame = self.next_frame()
+        if frame is None:
+            self.status = SOLVED # nothing to fill
+        else:
+            self.stack.append(frame)
+        return True
+
+    def run(self, max_nodes: int=None, deadline: float=None, cancel=None) -> SearchResult:
+        """Run (or resume) the search until it finishes or a limit is hit
+
+        Args:
+            max_nodes (int, optional): number of nodes this call may visit. Defaults to None (no limit).
+            deadline (float, optional): time.monotonic() value to stop at. Defaults to None (no limit).
+            cancel (optional): a threading/multiprocessing Event, the search stops once it is set. Defaults to None.
+
+        Returns:
+            SearchResult: the status, the board (solved or partial, None if unsat) and the total nodes visited
+        """
+        if not self.started:
+            if not self.start():
+                self.status = UNSAT
+            if self.status is not None:
+                return self.result()
+        elif self.status == UNSAT:
+            return self.result()
+        elif self.status == SOLVED:
+            # resuming after a solution moves on to the next one
+            if not self.stack:
+                self.status = UNSAT
+                return self.result()
+
+        if max_nodes is not None and max_nodes <= 0:
+            self.status = BUDGET_EXHAUSTED # no nodes to spend
+            return self.result()
+
+        stack = self.stack
+        stats = self.stats
+        budget = max_nodes if max_nodes is not None else -1
+        self.status = None
+        while stack:
+            frame = stack[-1]
+            options = frame[1]
+            if stats is not None and frame[2] > 0:
+                stats.backtracks += 1
+            self.undo_frame(frame)
+            if frame[2] == len(options):
+                stack.pop() # every option failed, backtrack
+                continue
+
+            num = options[frame[2]]
+            frame[2] += 1
+            self.nodes += 1
+            if stats is not None:
+                stats.record_node(len(stack), len(options))
+                start = time.perf_counter()
+            consistent = self.try_option(frame, num)
+            if stats is not None:
+                stats.add_time('propagation' if self.propagator else 'validation', time.perf_counter() - start)
+            if consistent:
+                if stats is not None:
+                    start = time.perf_counter()
+                child = self.next_frame()
+                if stats is not None:
+                    stats.add_time('selection', time.perf_counter() - start)
+                if child is None:
+                    self.status = SOLVED
+                    return self.result()
+                stack.append(child)
+
+            budget -= 1
+            if budget == 0:
+                self.status = BUDGET_EXHAUSTED
+                return self.result()
+            if self.nodes % CHECK_EVERY == 0:
+                if cancel is not None and cancel.is_set():
+                    self.status = CANCELLED
+                    return self.result()
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.status = BUDGET_EXHAUSTED
+                    return self.result()
+
+        self.status = UNSAT
+        return self.result()
+
+    def result(self) -> SearchResult:
+        """Package the current state of the search
+
+        Returns:
+            SearchResult: the status, board and total nodes visited
+        """
+        if self.stats is not None and self.propagator:
+            self.stats.eliminations = self.propagator.eliminations
+        board = None if self.status == UNSAT else self.get_board()
+        return SearchResult(self.status, board, self.nodes)
+
+    def split(self) -> list:
+        """Give away the untried options of the shallowest frame that has any, so another
+        worker can search them. This search won't visit them anymore
+
+        Returns:
+            list: a board (2d array) for each option given away, empty if there's nothing to give
+        """
+        for depth, frame in enumerate(self.stack):
+            cell, options, next_option = frame[0], frame[1], frame[2]
+            if next_option >= len(options):
+                continue
+            base = [row[:] for row in self.initial_board]
+            for parent in self.stack[:depth]:
+                # the option each parent frame is currently exploring
+                parent_cell = parent[0]
+                base[parent_cell // self.size][parent_cell % self.size] = parent[1][parent[2] - 1]
+
+            boards = []
+            for num in options[next_option:]:
+                board = [row[:] for row in base]
+                board[cell // self.size][cell % self.size] = num
+                boards.append(board)
+            frame[1] = options[:next_option]
+            return boards
+        return []
+
+    def iter_solutions(self, max_nodes: int=None, deadline: float=None, cancel=None):
+        """Go through every solution, resuming the search after each one. Runs on a fresh search
+        of the initial board so this one's stack, status and solve() aren't touched. Stops early if
+        a limit is hit, check self.enumeration_status to tell that apart from having found them all
+
+        Args:
+            max_nodes (int, optional): node budget for each run() call. Defaults to None (no limit).
+            deadline (float, optional): time.monotonic() value to stop at. Defaults to None (no limit).
+            cancel (optional): a threading/multiprocessing Event to stop on. Defaults to None.
+
+        Yields:
+            list: each solved board as a new 2d array
+        """
+        board = [row[:] for row in self.initial_board] # the solver fills in the board it is given
+        search = IterativeSearch(board, cell_selection=self.cell_selection, propagate=self.propagate)
+        while True:
+            result = search.run(max_nodes=max_nodes, deadline=deadline, cancel=cancel)
+            self.enumeration_status = result.status
+            if result.status != SOLVED:
+                return
+            yield result.board
+            if not search.stack:
+                self.enumeration_status = UNSAT
+                return # the board had nothing to fill
+
+    def count_solutions(self, limit: int=2) -> int:
+        """Count the solutions, stopping as soon as limit is reached
+        (limit=2 is enough to check that a puzzle has exactly one solution)
+
+        Args:
+            limit (int, optional): the most solutions to look for. Defaults to 2.
+
+        Returns:
+            int: the number of solutions found, at most limit
+        """
+        return sum(1 for _ in islice(self.iter_solutions(), limit))
+
+    def solve(self) -> list:
+        """solve the given sudoku within the node and time limits given to the constructor
+
+        Returns:
+            list: the solved board as a 2d array, the partial board if a limit was hit, None if unsolvable
+        """
+        deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        result = self.run(max_nodes=self.max_nodes, deadline=deadline)
+        return result.board
@@ -0,0 +1,104 @@
+"""
+Statistics that the solvers fill in while they run
+Solvers only get a SearchStats when asked for one (collect_stats=True), otherwise they
+keep self.stats = None and skip all the counting and timing
+Nothing to run here :)
+"""
+
+from collections import Counter
+
+
+class SearchStats():
+    __slots__ = ('nodes', 'backtracks', 'max_depth', 'eliminations', 'generations',
+                 'guesses_by_depth', 'times')
+
+    def __init__(self):
+        self.nodes = 0 # placements tried (samples evaluated for the GA)
+        self.backtracks = 0 # placements undone
+        self.max_depth = 0
+        self.eliminations = 0 # candidates removed by propagation
+        self.generations = 0 # GA only
+        self.guesses_by_depth = Counter() # depth: placements made where the cell had more than one option
+        self.times = Counter() # phase ('selection', 'validation', 'propagation', ...): seconds
+
+    def record_node(self, depth: int, num_options: int):
+        """Count a placement
+
+        Args:
+            depth (int): depth of the search when placing
+            num_options (int): how many options the cell had
+        """
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if num_options > 1:
+            self.guesses_by_depth[depth] += 1
+
+    def add_time(self, phase: str, seconds: float):
+        """Add time spent in one phase of the solver
+
+        Args:
+            phase (str): name of the phase
+            seconds (float): time spent
+        """
+        self.times[phase] += seconds
+
+    def merge(self, other: 'SearchStats'):
+        """Add in the stats of another search, e.g. one run by another process
+
+        Args:
+            other (SearchStats): stats to add, counts are summed and the deepest depth kept
+        """
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.eliminations += other.eliminations
+        self.generations += other.generations
+        self.guesses_by_depth.update(other.guesses_by_depth)
+        self.times.update(other.times)
+
+    def to_dict(self) -> dict:
+        """Get the stats as plain python types, so they can be pickled with the times
+
+        Returns:
+            dict: every stat by name
+        """
+        return {'nodes': self.nodes,
+                'backtracks': self.backtracks,
+                'max_depth': self.max_depth,
+                'eliminations': self.eliminations,
+                'generations': self.generations,
+                'guesses_by_depth': dict(self.guesses_by_depth),
+                'times': dict(self.times)}
+
+    def __repr__(self) -> str:
+        return f'SearchStats({self.to_dict()})'
+
+
+def aggregate_stats(all_stats: list) -> dict:
+    """Combine the stats of many boards into totals and means
+
+    Args:
+        all_stats (list): SearchStats objects or their to_dict() versions
+
+    Returns:
+        dict: the total and mean of each count, the deepest search, and the summed
+        guesses per depth and time per phase
+    """
+    all_stats = [s.to_dict() if isinstance(s, SearchStats) else s for s in all_stats]
+    num_boards = len(all_stats)
+    summary = {'boards': num_boards}
+    for key in ('nodes', 'backtracks', 'eliminations', 'generations'):
+        total = sum(s[key] for s in all_stats)
+        summary[f'total_{key}'] = total
+        summary[f'mean_{key}'] = total / num_boards if num_boards else 0
+    summary['max_depth'] = max((s['max_depth'] for s in all_stats), default=0)
+
+    guesses = Counter()
+    times = Counter()
+    for s in all_stats:
+        guesses.update(s['guesses_by_depth'])
+        times.update(s['times'])
+    summary['guesses_by_depth'] = dict(sorted(guesses.items()))
+    summary['times'] = dict(times)
+    return summary
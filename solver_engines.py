@@ -0,0 +1,56 @@
+"""
+The solver engines that the streaming pipeline and the command line solver can run by name
+Every engine is a function from a board to the solved board, None if it wasn't solved.
+Each one imports its solver when it is first called, so importing this file stays cheap and
+the command line solver can start without numpy or the solvers.
+Nothing to run here :)
+"""
+
+
+def solve_dlx(board: list) -> list:
+    from dancing_links import DancingLinks
+    return DancingLinks(board).solve()
+
+
+def solve_backtracking(board: list) -> list:
+    from backtracking_functions import Backtracking
+    return Backtracking(board).solve()
+
+
+def solve_propagation(board: list) -> list:
+    from backtracking_functions import Backtracking
+    return Backtracking(board, propagate=True).solve()
+
+
+def solve_genetic(board: list, generations: int=500):
+    from run_genetic import setup_genetic
+    solution, conflicts, _ = setup_genetic(board).evolve(generations=generations, offspring_n=300, elite_n=10)
+    return solution if conflicts == 0 else None
+
+
+def solve_annealing(board: list):
+    from sudoku_annealing import SudokuAnnealing
+    solution, conflicts, _ = SudokuAnnealing(board).anneal()
+    return solution if conflicts == 0 else None
+
+
+# engine name: function from a board to the solved board (None if it wasn't solved)
+ENGINES = {'dlx': solve_dlx,
+           'backtracking': solve_backtracking,
+           'propagation': solve_propagation,
+           'genetic': solve_genetic,
+           'annealing': solve_annealing}
+
+
+def get_solver(engine: str):
+    """Get the function that solves a board with the given engine
+
+    Args:
+        engine (str): name of the engine in ENGINES
+
+    Returns:
+        function: takes a board and returns the solved board, None if it wasn't solved
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'unknown engine {engine}, pick one of {tuple(ENGINES)}')
+    return ENGINES[engine]
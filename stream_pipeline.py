@@ -0,0 +1,175 @@
+"""
+Streaming pipeline over the full puzzle archive
+Puzzles are read one csv row at a time straight out of the Kaggle zip (or any csv), handed
+to worker processes in small chunks, and the results come back in order. Only a fixed number
+of chunks are ever in flight, so memory stays flat however many puzzles are streamed.
+Throughput is reported per difficulty tier.
+Run this file to stream the archive (or the bundled csvs if it hasn't been downloaded)
+"""
+
+import sudoku_tools as sutils
+from puzzle_store import DIFFICULTY_RANGES, KAGGLE_ZIP_PATH, CSV_PATHS
+from chunked_stream import map_chunks
+from solver_engines import get_solver
+from collections import namedtuple, defaultdict
+from functools import partial
+from itertools import islice
+import multiprocessing as mp
+import zipfile
+import csv
+import io
+import os
+import time
+
+PuzzleRecord = namedtuple('PuzzleRecord', ['id', 'puzzle', 'solution', 'clues', 'difficulty'])
+SolveResult = namedtuple('SolveResult', ['id', 'tier', 'seconds', 'correct'])
+
+
+def get_tier(difficulty: float) -> str:
+    """Get the difficulty tier of a rating, same tiers as data_preprocess.ipynb
+
+    Args:
+        difficulty (float): the rating
+
+    Returns:
+        str: 'easy', 'medium' or 'hard'
+    """
+    for tier, (lo, hi) in DIFFICULTY_RANGES.items():
+        if (lo is None or difficulty > lo) and (hi is None or difficulty <= hi):
+            return tier
+
+
+def iter_records(source: str, tier: str=None, limit: int=None):
+    """Read puzzles one row at a time from a csv, or the first csv in a zip
+
+    Args:
+        source (str): path to a .csv or .zip file
+        tier (str, optional): only yield puzzles of this difficulty tier. Defaults to None (all).
+        limit (int, optional): stop after this many puzzles. Defaults to None (no limit).
+
+    Yields:
+        PuzzleRecord: id, puzzle and solution strings, clue count and difficulty rating
+    """
+    def read_rows(f):
+        reader = csv.reader(f)
+        columns = {name: i for i, name in enumerate(next(reader))}
+        id_col, puzzle_col, solution_col = columns['id'], columns['puzzle'], columns['solution']
+        clues_col, difficulty_col = columns['clues'], columns['difficulty']
+        for row in reader:
+            yield PuzzleRecord(row[id_col], row[puzzle_col], row[solution_col],
+                               int(row[clues_col]), float(row[difficulty_col]))
+
+    def read_source():
+        if source.endswith('.zip'):
+            with zipfile.ZipFile(source) as z:
+                csv_name = [name for name in z.namelist() if name.endswith('.csv')][0]
+                with z.open(csv_name) as f:
+                    yield from read_rows(io.TextIOWrapper(f, encoding='ascii', newline=''))
+        else:
+            with open(source, newline='') as f:
+                yield from read_rows(f)
+
+    records = read_source()
+    if tier is not None:
+        records = (record for record in records if get_tier(record.difficulty) == tier)
+    return islice(records, limit)
+
+
+def solve_chunk(engine: str, records: list) -> list:
+    """Solve a chunk of puzzles, this is what the worker processes run
+
+    Args:
+        engine (str): name of the engine in solver_engines.ENGINES
+        records (list): PuzzleRecords to solve
+
+    Returns:
+        list: a SolveResult for each record
+    """
+    solve = get_solver(engine)
+    results = []
+    for record in records:
+        board = sutils.Board.from_string(record.puzzle)
+        start_time = time.perf_counter()
+        solution = solve(board)
+        seconds = time.perf_counter() - start_time
+        correct = solution is not None and sutils.Board.from_array(solution).to_string() == record.solution
+        results.append(SolveResult(record.id, get_tier(record.difficulty), seconds, correct))
+    return results
+
+
+def solve_stream(records, engine: str='propagation', processes: int=None, chunk_size: int=64,
+                 max_pending: int=None):
+    """Solve a stream of puzzles with a pool of workers, in order and with bounded memory
+
+    Args:
+        records: iterable of PuzzleRecords, read lazily
+        engine (str, optional): name of the engine in solver_engines.ENGINES. Defaults to 'propagation'.
+        processes (int, optional): worker processes, 1 solves in this process. Defaults to None (all cores).
+        chunk_size (int, optional): puzzles sent to a worker at a time. Defaults to 64.
+        max_pending (int, optional): chunks in flight before reading more puzzles. Defaults to 2 per process.
+
+    Yields:
+        SolveResult: the result for each puzzle, in the order they were read
+    """
+    processes = processes or mp.cpu_count()
+    for results in map_chunks(partial(solve_chunk, engine), records, processes, chunk_size, max_pending):
+        yield from results
+
+
+def run_pipeline(sources: list, engine: str='propagation', tier: str=None, limit: int=None,
+                 processes: int=None, chunk_size: int=64, report_every: int=100000) -> dict:
+    """Stream every puzzle in the sources through an engine and total up the results per tier
+
+    Args:
+        sources (list): csv or zip files to read
+        engine (str, optional): name of the engine in solver_engines.ENGINES. Defaults to 'propagation'.
+        tier (str, optional): only solve puzzles of this difficulty tier. Defaults to None (all).
+        limit (int, optional): puzzles to solve from each source. Defaults to None (all).
+        processes (int, optional): worker processes. Defaults to None (all cores).
+        chunk_size (int, optional): puzzles sent to a worker at a time. Defaults to 64.
+        report_every (int, optional): print the totals so far every this many puzzles. Defaults to 100000.
+
+    Returns:
+        dict: tier: {'puzzles', 'correct', 'solve_seconds', 'puzzles_per_second'}, plus 'total' with
+        the wall clock time and overall throughput
+    """
+    records = (record for source in sources for record in iter_records(source, tier, limit))
+    totals = defaultdict(lambda: {'puzzles': 0, 'correct': 0, 'solve_seconds': 0.0})
+    start_time = time.perf_counter()
+    for i, result in enumerate(solve_stream(records, engine, processes, chunk_size), start=1):
+        tier_totals = totals[result.tier]
+        tier_totals['puzzles'] += 1
+        tier_totals['correct'] += result.correct
+        tier_totals['solve_seconds'] += result.seconds
+        if i % report_every == 0:
+            print(f'{i} puzzles, {i / (time.perf_counter() - start_time):.1f} puzzles/s')
+
+    wall_seconds = time.perf_counter() - start_time
+    summary = {}
+    for tier_name in DIFFICULTY_RANGES:
+        if tier_name in totals:
+            tier_totals = dict(totals[tier_name])
+            # per worker, puzzles for each second spent solving
+            tier_totals['puzzles_per_second'] = tier_totals['puzzles'] / tier_totals['solve_seconds'] \
+                                                if tier_totals['solve_seconds'] else float('inf')
+            summary[tier_name] = tier_totals
+    num_puzzles = sum(t['puzzles'] for t in totals.values())
+    summary['total'] = {'puzzles': num_puzzles,
+                        'correct': sum(t['correct'] for t in totals.values()),
+                        'wall_seconds': wall_seconds,
+                        'puzzles_per_second': num_puzzles / wall_seconds if wall_seconds else float('inf')}
+    return summary
+
+
+def main():
+    sources = [KAGGLE_ZIP_PATH] if os.path.exists(KAGGLE_ZIP_PATH) else CSV_PATHS
+    for engine, limit in [('dlx', None), ('propagation', None), ('genetic', 5)]:
+        print(f'---------------{engine}---------------')
+        summary = run_pipeline(sources, engine=engine, limit=limit)
+        for tier, totals in summary.items():
+            print(f'{tier}: {totals["puzzles"]} puzzles, {totals["correct"]} correct, '
+                  f'{totals["puzzles_per_second"]:.1f} puzzles/s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import genetic_functions as genutils
+from search_stats import SearchStats
+import numpy as np
+import multiprocessing as mp
+import math
+import time
+
+
+# temperature after step steps since the last (re)heat to t0, rate sets how fast it cools
+COOLING = {'geometric': lambda t0, step, rate: t0 * rate ** step,
+           'linear': lambda t0, step, rate: t0 * max(1 - (1 - rate) * step, 0),    # 0 after 1/(1 - rate) steps
+           'logarithmic': lambda t0, step, rate: t0 / (1 + math.log1p((1 - rate) * step))}
+
+
+class SudokuAnnealing:
+    ''' Simulated annealing over one board, with a tabu list. Like SudokuGeneticAlgorithm the board
+    starts with each row's blanks filled with its missing digits, and every move swaps two mutable
+    cells of a row, so the rows never conflict. Moves are scored with genutils.ConflictTables, the
+    same total as genutils.total_conflicts '''
+
+    def __init__(self, initial_board, collect_stats=False, rng=None):
+        ''' rng: np.random.Generator for every random draw, None for the global np.random '''
+        self.initial_board = np.array(initial_board, dtype=int)   # copy of the 2d list/array/sutils.Board
+        self.mutable = genutils.MutableCells(self.initial_board == 0)    # index tables of the mutable positions
+        self.evolution = []     # best conflicts every record_every steps
+        self.summary = {}   # how the last anneal went, see anneal
+        self.stats = SearchStats() if collect_stats else None   # filled in by anneal when collect_stats
+        self.rng = rng
+
+    @property
+    def rand(self):
+        ''' Where random numbers are drawn from: self.rng, or np.random if it has none '''
+        return np.random if self.rng is None else self.rng
+
+    def random_board(self):
+        ''' Fill the blanks of each row with a random permutation of the row's missing digits '''
+        board = self.initial_board.copy()
+        digits = np.arange(1, len(board) + 1)
+        for r, cols in enumerate(self.mutable.rows):
+            board[r, cols] = self.rand.permutation(np.setdiff1d(digits, board[r]))
+        return board
+
+    def start_temperature(self, board, tables, samples=200):
+        ''' Standard deviation of the change in conflicts over random swaps, a usual starting temperature '''
+        deltas = []
+        for r, c1, c2 in zip(*(idx.tolist() for idx in genutils.draw_row_swaps(self.mutable, samples, self.rand))):
+            deltas.append(tables.swap(board, (r, c1), (r, c2)))
+            tables.swap(board, (r, c1), (r, c2))
+        return max(float(np.std(deltas)), 0.1)
+
+    def anneal(self, max_steps=2000000, start_temp=None, cooling='geometric', cooling_rate=0.9999,
+               tabu_tenure=10, reheat_after=20000, reheat_temp=None, time_limit=900, record_every=1000):
+        ''' Anneal from a random board, return the best board found, its conflicts and time taken
+        start_temp: temperature to start at, defaults to start_temperature
+        cooling: name in COOLING or a function (t0, step, rate) -> temperature
+        cooling_rate: rate given to the cooling function, closer to 1 cools slower
+        tabu_tenure: steps that swapping the same two cells back is tabu, unless it gives a new best
+        reheat_after: steps without a new best before heating back up to reheat_temp (defaults to the
+            start temperature), the cooling starts again from there
+        self.summary is filled in with whether it was solved, steps, steps_to_solve (None if not
+        solved), wall time and the number of reheats '''
+        start_time = time.time()
+        rand = self.rand
+        cells = self.mutable
+        cool = COOLING[cooling] if isinstance(cooling, str) else cooling
+
+        board = self.random_board()
+        tables = genutils.ConflictTables(board)
+        conflicts = tables.conflicts
+        best, best_conflicts = board.copy(), conflicts
+        start_temp = start_temp or self.start_temperature(board, tables)
+        reheat_temp = reheat_temp or start_temp
+        t0 = start_temp
+        tabu = {}   # (row, col1, col2): step it stops being tabu
+        last_heat = last_improvement = 0
+        reheats = 0
+        block = 1000    # random numbers are drawn this many steps at a time
+        steps = 0   # steps run
+        if len(cells.swap_rows) == 0:
+            max_steps = 0   # nothing to swap
+        self.evolution.append(best_conflicts)
+
+        for step in range(max_steps):
+            if best_conflicts == 0:
+                break
+            j = step % block
+            if j == 0:
+                if time.time() - start_time > time_limit:
+                    break
+                rows, cols1, cols2 = (idx.tolist() for idx in genutils.draw_row_swaps(cells, block, rand))
+                uniforms = rand.random(block).tolist()
+                tabu = {move: until for move, until in tabu.items() if until > step}
+
+            r, c1, c2 = rows[j], cols1[j], cols2[j]
+            move = (r, c1, c2) if c1 < c2 else (r, c2, c1)
+            temp = cool(t0, step - last_heat, cooling_rate)
+            delta = tables.swap(board, (r, c1), (r, c2))
+            is_tabu = tabu.get(move, -1) > step and conflicts + delta >= best_conflicts
+            if is_tabu or (delta > 0 and (temp <= 0 or uniforms[j] >= math.exp(-delta / temp))):
+                tables.swap(board, (r, c1), (r, c2))   # rejected, swap back
+            else:
+                conflicts += delta
+                tabu[move] = step + tabu_tenure
+                if conflicts < best_conflicts:
+                    best, best_conflicts = board.copy(), conflicts
+                    last_improvement = step
+
+            if step - last_improvement >= reheat_after and step - last_heat >= reheat_after:
+                t0 = reheat_temp
+                last_heat = step
+                reheats += 1
+            steps += 1
+            if steps % record_every == 0:
+                self.evolution.append(best_conflicts)
+
+        if steps % record_every:
+            self.evolution.append(best_conflicts)
+        seconds = time.time() - start_time
+        if self.stats is not None:
+            self.stats.nodes += steps
+            self.stats.add_time('annealing', seconds)
+        self.summary = {'solved': best_conflicts == 0,
+                        'conflicts': best_conflicts,
+                        'steps': steps,
+                        'steps_to_solve': last_improvement + 1 if best_conflicts == 0 else None,
+                        'time': seconds,
+                        'reheats': reheats}
+        return best, best_conflicts, seconds
+
+    def anneal_multistart(self, starts=None, processes=None, seed=None, **anneal_params):
+        ''' Anneal from several random boards on a pool of processes, stopping at the first solution
+        starts: number of runs, defaults to one per process
+        processes: worker processes, defaults to all cores, 1 runs them one after another here
+        seed: for np.random.SeedSequence, each run gets its own independent np.random.Generator
+        anneal_params: passed on to anneal
+        Return the best board over all runs, its conflicts and time taken like anneal, self.evolution
+        and self.summary are the best run's, with the number of runs finished in summary['starts'] '''
+        start_time = time.time()
+        processes = processes or mp.cpu_count()
+        starts = starts or processes
+        seeds = np.random.SeedSequence(seed).spawn(starts)
+        args = [(self, seed_seq, anneal_params) for seed_seq in seeds]
+
+        finished = []
+        if processes == 1:
+            for arg in args:
+                finished.append(run_start(arg))
+                if finished[-1][1] == 0:
+                    break
+        else:
+            with mp.Pool(processes=processes) as pool:   # leaving the block stops the runs still going
+                for result in pool.imap_unordered(run_start, args):
+                    finished.append(result)
+                    if result[1] == 0:
+                        break
+
+        board, conflicts, evolution, summary = min(finished, key=lambda result: result[1])
+        self.evolution = evolution
+        self.summary = dict(summary, starts=len(finished), time=time.time() - start_time)
+        if self.stats is not None:
+            self.stats.nodes += sum(result[3]['steps'] for result in finished)
+        return board, conflicts, self.summary['time']
+
+
+def run_start(args):
+    ''' One run of SudokuAnnealing.anneal_multistart, run in a worker process '''
+    sa, seed_seq, anneal_params = args
+    sa = SudokuAnnealing(sa.initial_board, rng=np.random.default_rng(seed_seq))
+    board, conflicts, _ = sa.anneal(**anneal_params)
+    return board, conflicts, sa.evolution, sa.summary
@@ -5,11 +5,20 @@ To tweak visualization, comment out section and load in the saved pkl files and
 """
 import sudoku_tools as sutils
 import backtracking_functions as sb
+from search_stats import aggregate_stats
+from dancing_links import DancingLinks
+from search_driver import IterativeSearch
+from parallel_search import ParallelSearch
 import pprint
 import time
-import matplotlib.pyplot as plt
 import pickle
 
+# solver backends that test_level can switch between by name
+SOLVERS = {'backtracking': sb.Backtracking,
+           'dlx': DancingLinks,
+           'iterative': IterativeSearch,
+           'parallel': ParallelSearch}
+
 def save_dict(save_dict: dict, filename: str):
     with open(filename, 'wb') as f:
         pickle.dump(save_dict, f)
@@ -18,30 +27,32 @@ def load_dict(filename: str) -> dict:
     with open(filename, 'rb') as f:
         return pickle.load(f)
 
-def test_level(difficulty: str, num_examples: int=10):
+def test_level(difficulty: str, num_examples: int=10, solver: str='backtracking', collect_stats: bool=False, seed: int=None, **solver_kwargs):
     print(f'RESULTS FOR {difficulty.upper()} LEVEL!!!!:\n')
+    solver_class = SOLVERS[solver]
+    if collect_stats:
+        solver_kwargs['collect_stats'] = True
     times = []
     percents = []
+    all_stats = []
     progess_count = 1
-    boards = sutils.get_test_boards(difficulty=difficulty, num_examples=num_examples)
+    boards = sutils.get_test_boards(difficulty=difficulty, num_examples=num_examples, seed=seed)
     for board in boards:
-        solver = sb.Backtracking(board['board_input'])
+        board_solver = solver_class(board['board_input'], **solver_kwargs)
         
-        start_time = time.time()
-        gen_sol = solver.solve() # the solution generated by the algorithm
-        end_time = time.time()
+        start_time = time.perf_counter()
+        gen_sol = board_solver.solve() # the solution generated by the algorithm
+        end_time = time.perf_counter()
         elapsed_time = end_time - start_time
         
-        gen_sol_str = sutils.array_to_formatted(gen_sol) 
-        given_sol_str = board['solution']
-        given_sol = sutils.formatted_to_array(given_sol_str) # turn into array
+        given_sol = board['solution'] # a sutils.Board, only rendered when printed
         
         # check if solutions match
         percent_correct, num_correct = sutils.check_solution(generated_sol=gen_sol, actual_sol=given_sol)
-        print('Solution generated by Backtracking algorithm:')
-        print(gen_sol_str)
+        print(f'Solution generated by {solver} algorithm:')
+        print(sutils.array_to_formatted(gen_sol))
         print('Solution given by dataset:')
-        print(given_sol_str)
+        print(given_sol)
         print('Stats:')
         print(f'Number Correct: {num_correct},\n'
               f'Percent Correct: {percent_correct*100:.2f}%\n'
@@ -51,13 +62,15 @@ def test_level(difficulty: str, num_examples: int=10):
         print()
         times.append(elapsed_time)
         percents.append(percent_correct)
+        if collect_stats:
+            all_stats.append(board_solver.stats.to_dict())
         
-    return times, percents
+    return times, percents, all_stats
 
-def collect_level_data(num_examples: int=10):
-    easy_times, easy_pcts = test_level(difficulty='easy', num_examples=num_examples)
-    med_times, med_pcts = test_level(difficulty='medium', num_examples=num_examples)
-    hard_times, hard_pcts = test_level(difficulty='hard', num_examples=num_examples)
+def collect_level_data(num_examples: int=10, seed: int=None, **solver_kwargs):
+    easy_times, easy_pcts, easy_stats = test_level(difficulty='easy', num_examples=num_examples, seed=seed, **solver_kwargs)
+    med_times, med_pcts, med_stats = test_level(difficulty='medium', num_examples=num_examples, seed=seed, **solver_kwargs)
+    hard_times, hard_pcts, hard_stats = test_level(difficulty='hard', num_examples=num_examples, seed=seed, **solver_kwargs)
     
     times_dict = {'easy': easy_times,
              'medium': med_times,
@@ -65,10 +78,16 @@ def collect_level_data(num_examples: int=10):
     percents_dict = {'easy': easy_pcts,
                 'medium': med_pcts,
                 'hard': hard_pcts}
+    # per board stats plus a summary for each level, empty unless collect_stats=True
+    stats_dict = {}
+    for diff, level_stats in [('easy', easy_stats), ('medium', med_stats), ('hard', hard_stats)]:
+        if level_stats:
+            stats_dict[diff] = {'boards': level_stats, 'summary': aggregate_stats(level_stats)}
     
-    return times_dict, percents_dict
+    return times_dict, percents_dict, stats_dict
         
 def generate_viz(times:dict, percents:dict, y_cutoff:int=None, times_savefile:str='TimePlotBacktracking.png', percents_savefile:str='PercentPlotBacktracking.png'):
+    import matplotlib.pyplot as plt # only needed here, and slow to import
     # transform the data for plotting
     difficulties = list(times.keys())
     num_examples = len(times['easy'])
@@ -110,11 +129,12 @@ def generate_viz(times:dict, percents:dict, y_cutoff:int=None, times_savefile:st
 
 def main():
     # # ------- uncomment to run backtracking algorithm ----------
-    # times_dict, percent_dict = collect_level_data(num_examples=1000)
+    # times_dict, percent_dict, stats_dict = collect_level_data(num_examples=1000, seed=42, collect_stats=True) # solver='dlx' for dancing links, solver='iterative' with max_nodes/time_limit to bound each board, cell_selection='scan' for the old heuristic, propagate=True for propagation
     
     # # save the dicts for later
     # save_dict(save_dict=times_dict, filename='times_dict_updated1000.pkl')
     # save_dict(save_dict=percent_dict, filename='percent_dict_updated1000.pkl')
+    # save_dict(save_dict=stats_dict, filename='stats_dict_updated1000.pkl')
     # # -------------------------------------------------------------
     
     # load in the dicts
@@ -1,128 +1,568 @@
 import sudoku_tools as sutils
+import genetic_functions as genutils
+import constraint_propagation as cprop
+from search_stats import SearchStats
+from search_driver import IterativeSearch, SOLVED, UNSAT
 import numpy as np
 from functools import reduce
+import multiprocessing as mp
+import queue
 import copy
 import time
 
 
 class SudokuGeneticAlgorithm:
 
-    def __init__(self, initial_board):
-        self.initial_board = initial_board
-        self.mutable = list(zip(*np.where(self.initial_board == 0)))   # list of indices of mutable positions
-        self.population = {}    # potential solution array, scores: board
+    def __init__(self, initial_board, collect_stats=False, rng=None):
+        ''' rng: np.random.Generator for every random draw the GA makes itself, None for the global np.random '''
+        self.initial_board = np.array(initial_board, dtype=int)   # copy of the 2d list/array/sutils.Board
+        self.mutable = genutils.MutableCells(self.initial_board == 0)    # index tables of the mutable positions
+        self.candidates = None  # (n, n, n) bool [r, c, d-1] digits a cell can take, see seed_candidates
         self.evolution = []     # store best solution over generations
+        self.diversity = []     # elite diversity over generations, see elite_diversity
+        self.summary = {}   # how the last evolve went, see evolve
         self.fitness = {}   # name: func
+        self.batch_fitness = {}     # name: func scoring a (P, n, n) population, see genutils.BATCH_FITNESS
         self.agents = {}    # name: func
+        self.batch_agents = {}  # name: func mutating a (P, n, n) population, see genutils.BATCH_AGENTS
         self.agent_weights = []     # weights for agent functions
+        self.stats = SearchStats() if collect_stats else None   # filled in by evolve when collect_stats
+        self.rng = rng
 
-    def add_fitness(self, func_name, func):
+        # population, stored as parallel arrays: the first self.size rows are in use
+        # next_boards is the second buffer that evolve builds the next generation in
+        self.size = 0
+        self.boards = np.zeros((0,) + self.initial_board.shape, dtype=np.uint8)
+        self.next_boards = self.boards.copy()
+        self.scores = np.zeros((0, 0), dtype=np.int32)     # one column per fitness function
+        self.conflicts = np.zeros(0, dtype=np.int32)      # sum of the scores
+        # best different samples seen, kept across restarts, best first
+        self.archive = np.zeros((0,) + self.initial_board.shape, dtype=np.uint8)
+        self.archive_conflicts = np.zeros(0, dtype=np.int32)
+
+    @property
+    def rand(self):
+        ''' Where the GA draws random numbers from: self.rng, or np.random if it has none '''
+        return np.random if self.rng is None else self.rng
+
+    def add_fitness(self, func_name, func, batch_func=None):
+        ''' batch_func(pop, hot) scores a whole population, found in genutils.BATCH_FITNESS if not given '''
+        if self.size:
+            raise ValueError('add fitness functions before generating samples')
         self.fitness[func_name] = func
+        self.batch_fitness[func_name] = batch_func or genutils.BATCH_FITNESS.get(func)
 
-    def add_agent(self, func_name, func, w):
+    def add_agent(self, func_name, func, w, batch_func=None):
+        ''' batch_func(pop, cells, k) mutates a whole population, found in genutils.BATCH_AGENTS if not given '''
         self.agents[func_name] = func
         self.agent_weights.append(w)
+        self.batch_agents[func_name] = batch_func or genutils.BATCH_AGENTS.get(func)
+
+    def reserve(self, capacity):
+        ''' Grow the population arrays (and the second buffer) to hold at least capacity samples '''
+        if capacity <= len(self.boards) and self.scores.shape[1] == len(self.fitness):
+            return
+        capacity = max(capacity, 2 * len(self.boards))
+        shape = (capacity,) + self.initial_board.shape
+        boards = np.zeros(shape, dtype=np.uint8)
+        boards[:self.size] = self.boards[:self.size]
+        scores = np.zeros((capacity, len(self.fitness)), dtype=np.int32)
+        scores[:self.size, :self.scores.shape[1]] = self.scores[:self.size]
+        conflicts = np.zeros(capacity, dtype=np.int32)
+        conflicts[:self.size] = self.conflicts[:self.size]
+        self.boards, self.scores, self.conflicts = boards, scores, conflicts
+        self.next_boards = np.zeros(shape, dtype=np.uint8)
+
+    def score(self, pop):
+        ''' Scores of a (P, n, n) array of samples, (P, number of fitness functions) '''
+        if self.stats is not None:
+            eval_start = time.perf_counter()
+            self.stats.nodes += len(pop)
+        scores = np.zeros((len(pop), len(self.fitness)), dtype=np.int32)
+        if all(self.batch_fitness.values()):
+            hot = genutils.one_hot(pop)
+            for j, func in enumerate(self.batch_fitness.values()):
+                scores[:, j] = func(pop, hot)
+        else:
+            for j, func in enumerate(self.fitness.values()):
+                scores[:, j] = [func(board) for board in pop]
+        if self.stats is not None:
+            self.stats.add_time('evaluation', time.perf_counter() - eval_start)
+        return scores
+
+    def evaluate(self, start, stop):
+        ''' Score the samples in rows start:stop of the population '''
+        if start == stop:
+            return
+        self.scores[start:stop] = self.score(self.boards[start:stop])
+        self.conflicts[start:stop] = self.scores[start:stop].sum(axis=1)
 
     def add_sample(self, sample):
         ''' Evaluate fitness of sample and add to population '''
-        scores = tuple([(key, func(sample)) for key, func in self.fitness.items()])
-        value = {'eval': scores, 'total conflicts': sum(score for _, score in scores),
-                 'board': sample}
-        self.population[len(self.population)+1] = value
+        self.add_samples([sample])
+
+    def add_samples(self, samples):
+        ''' Evaluate fitness of many samples in one pass and add them to population '''
+        start = self.size
+        self.reserve(start + len(samples))
+        for i, sample in enumerate(samples):
+            self.boards[start + i] = sample
+        self.size += len(samples)
+        self.evaluate(start, self.size)
+
+    def replace_worst(self, samples):
+        ''' Overwrite the worst samples in the population with new ones (e.g. migrants from another island) '''
+        k = min(len(samples), self.size)
+        if k == 0:
+            return
+        samples = np.asarray(samples[:k], dtype=np.uint8)
+        worst = np.argpartition(self.conflicts[:self.size], self.size - k)[self.size - k:]
+        self.boards[worst] = samples
+        self.scores[worst] = self.score(samples)
+        self.conflicts[worst] = self.scores[worst].sum(axis=1)
+
+    def seed_candidates(self):
+        ''' Shrink the search space before generating samples: constraint propagation fills in the cells
+        it can deduce (they stop being mutable) and the candidates left for the other cells are kept,
+        so generate_samples only puts a cell's candidates in it.
+        Return False, changing nothing, if propagation finds the puzzle has no solution '''
+        if self.size:
+            raise ValueError('seed candidates before generating samples')
+        propagator = cprop.Propagator(self.initial_board)
+        if not propagator.consistent or not propagator.propagate():
+            return False
+        n = len(self.initial_board)
+        self.initial_board = np.array(propagator.to_board(), dtype=int)
+        self.mutable = genutils.MutableCells(self.initial_board == 0)
+        masks = np.array(propagator.cands, dtype=np.int64).reshape(n, n)
+        self.candidates = ((masks[..., None] >> np.arange(1, n + 1)) & 1).astype(bool) & self.mutable.mask[..., None]
+        return True
+
+    def candidate_row(self, r, missing):
+        ''' Digits for the blanks of row r, a random matching of the missing digits to cells that have
+        them as candidates (any leftovers are placed at random) '''
+        cols = self.mutable.rows[r]
+        options = [[num for num in missing if self.candidates[r, c, num - 1]] for c in cols]
+        new = genutils.random_matching(options, self.rand)
+        leftover = self.rand.permutation(list(set(missing) - set(new))).tolist()
+        return [num if num is not None else leftover.pop() for num in new]
 
     def generate_samples(self, size):
-        for _ in range(size):
-            board = self.initial_board.copy()
+        start = self.size
+        self.reserve(start + size)
+        for s in range(start, start + size):
+            board = self.boards[s]
+            board[:] = self.initial_board
             for i in range(len(board)):
                 row = board[i]
                 immutable_indices = np.where(row > 0)
                 mutable_indices = np.where(row == 0)
-                missing = list(set(np.arange(1, 10)) - set(row[immutable_indices]))
-                new = np.random.choice(missing, size=len(missing), replace=False)
+                missing = list(set(np.arange(1, len(board) + 1)) - set(row[immutable_indices]))
+                if self.candidates is None:
+                    new = self.rand.choice(missing, size=len(missing), replace=False)
+                else:
+                    new = self.candidate_row(i, [int(num) for num in missing])
                 row[mutable_indices] = new
-
-            self.add_sample(board)
+        self.size += size
+        self.evaluate(start, self.size)
 
     def generate_random_samples(self, size):
-        for _ in range(size):
-            sample = np.where(self.initial_board == 0,
-                              np.random.randint(1, 10, size=self.initial_board.shape),
-                              self.initial_board)
+        start = self.size
+        self.reserve(start + size)
+        for s in range(start, start + size):
+            self.boards[s] = np.where(self.initial_board == 0,
+                                      genutils.randint(self.rand, 1, len(self.initial_board) + 1,
+                                                       size=self.initial_board.shape),
+                                      self.initial_board)
+        self.size += size
+        self.evaluate(start, self.size)
 
-            self.add_sample(sample)
+    def get_top_k_indices(self, k=1):
+        ''' Rows of the k samples with the fewest conflicts, best first '''
+        k = min(k, self.size)
+        conflicts = self.conflicts[:self.size]
+        if k < self.size:
+            top = np.argpartition(conflicts, k - 1)[:k]
+        else:
+            top = np.arange(self.size)
+        return top[np.argsort(conflicts[top], kind='stable')]
 
     def get_top_k_solutions(self, k=1):
-        sorted_items = sorted(self.population.items(), key=lambda item: item[1]['total conflicts'])
-        top_k_items = sorted_items[:k]
-        top_indices = [item[0] for item in top_k_items]
-        top_evals = [item[1]['eval'] for item in top_k_items]
-        top_conflicts = [item[1]['total conflicts'] for item in top_k_items]
-        top_boards = [item[1]['board'] for item in top_k_items]
+        top_indices = self.get_top_k_indices(k)
+        names = list(self.fitness.keys())
+        top_evals = [tuple(zip(names, self.scores[i].tolist())) for i in top_indices]
+        top_conflicts = self.conflicts[top_indices].tolist()
+        top_boards = [self.boards[i].copy() for i in top_indices]
         return top_indices, top_evals, top_conflicts, top_boards
 
     def mutate(self, sample):
         ''' Mutate a random solution in current population with agent, add to population '''
-        selected_agent = np.random.choice(list(self.agents.keys()), p=self.agent_weights)
+        selected_agent = self.rand.choice(list(self.agents.keys()), p=self.agent_weights)
         agent_func = self.agents[selected_agent]
-        k = np.random.randint(2, 5)
+        k = genutils.randint(self.rand, 2, 5)
         mutated = agent_func(sample, self.mutable, k)
         return mutated
 
+    def mutate_batch(self, pop, mutation_rate=0.8, moves=(2, 5)):
+        ''' Mutate each sample of pop in place with probability like make_offspring, the samples
+        given to an agent with a batch version are mutated in one call
+        moves: (lo, hi) range of the number of moves k given to the agent '''
+        rand = self.rand
+        mutated = np.flatnonzero(rand.standard_normal(len(pop)) < mutation_rate)
+        agent_ids = rand.choice(len(self.agents), size=len(mutated), p=self.agent_weights)
+        moves = genutils.randint(rand, moves[0], moves[1], size=len(mutated))
+        for a, (name, agent_func) in enumerate(self.agents.items()):
+            chosen = agent_ids == a
+            idx, k = mutated[chosen], moves[chosen]
+            if len(idx) == 0:
+                continue
+            batch_func = self.batch_agents[name]
+            if batch_func is None:
+                for i, k_i in zip(idx, k):
+                    pop[i] = agent_func(pop[i], self.mutable, k_i)
+            else:
+                samples = pop[idx]
+                pop[idx] = batch_func(samples, self.mutable, k, rng=rand)
+        return pop
+
+    def make_offspring(self, parent1, parent2, mutation_rate=0.8, out=None):
+        ''' Crossover row-wise and maybe mutate, return the offspring without scoring it
+        out: array to write the offspring into, a new one if not given '''
+        crossover_point = genutils.randint(self.rand, 0, len(parent1))
+        if out is None:
+            out = np.empty_like(parent1)
+        out[:crossover_point] = parent1[:crossover_point]
+        out[crossover_point:] = parent2[crossover_point:]
+
+        if self.rand.standard_normal() < mutation_rate:
+            out = self.mutate(out)
+        return out
+
     def crossover(self, parent1, parent2, mutation_rate=0.8):
         ''' Crossover population row-wise '''
-        crossover_point = np.random.randint(0, 9)
-        offspring = np.vstack((parent1[:crossover_point], parent2[crossover_point:]))
+        self.add_sample(self.make_offspring(parent1, parent2, mutation_rate))
+
+    # -------------------- Stagnation --------------------
+
+    def stagnation(self, start=0):
+        ''' Generations since the best conflicts in self.evolution[start:] last improved '''
+        history = self.evolution[start:]
+        if not history:
+            return 0
+        return len(history) - 1 - history.index(min(history))
+
+    def elite_diversity(self, indices):
+        ''' Mean Hamming distance between the samples at indices, as a fraction of the mutable cells
+        (0 when they are all the same) '''
+        if len(indices) < 2 or len(self.mutable) == 0:
+            return 0.0
+        cells = self.boards[indices][:, self.mutable.mask]     # (k, mutable cells)
+        different = (cells[:, None] != cells[None]).sum(axis=2)
+        k = len(indices)
+        return float(different.sum() / (k * (k - 1) * len(self.mutable)))
+
+    def update_archive(self, indices, archive_n):
+        ''' Add the samples at indices to the archive, keeping the archive_n best different ones '''
+        boards = np.concatenate((self.archive, self.boards[indices]))
+        conflicts = np.concatenate((self.archive_conflicts, self.conflicts[indices]))
+        _, first = np.unique(boards.reshape(len(boards), -1), axis=0, return_index=True)
+        best = first[np.argsort(conflicts[first], kind='stable')][:archive_n]
+        self.archive, self.archive_conflicts = boards[best], conflicts[best]
+
+    # -------------------- Exact finisher --------------------
+
+    def elite_agreement(self, indices):
+        ''' (n, n) fraction of the samples at indices with the same digit as the first one in each cell '''
+        return (self.boards[indices] == self.boards[indices[0]]).mean(axis=0)
 
-        if np.random.randn() < mutation_rate:
-            offspring = self.mutate(offspring)
-        self.add_sample(offspring)
+    def finish(self, indices, agreed, agreement=0.9, max_nodes=20000, rounds=6):
+        ''' Complete the sample at indices[0] with the exact solver: its cells that at least agreement
+        of the samples agree on and that don't conflict are frozen, the rest are cleared and searched
+        (Backtracking with propagation, max_nodes per search). When the search proves the frozen cells
+        can't be completed, the least agreed on half of them is unfrozen and it tries again, up to
+        rounds searches. Return the solved board, None if it wasn't found '''
+        best = self.boards[indices[0]]
+        frozen = self.mutable.mask & ~genutils.conflicting_cells(best) & (agreed >= agreement)
+        for _ in range(rounds):
+            partial = np.where(frozen | ~self.mutable.mask, best, 0)
+            result = IterativeSearch(partial.tolist(), propagate=True).run(max_nodes=max_nodes)
+            if result.status == SOLVED:
+                return np.array(result.board)
+            if result.status != UNSAT or not frozen.any():
+                return None     # out of nodes, or the puzzle itself has no solution
+            kept = np.flatnonzero(frozen)
+            least_agreed = kept[np.argsort(agreed.flat[kept], kind='stable')]
+            frozen.flat[least_agreed[:max(1, len(kept) // 2)]] = False
+        return None
 
-    def evolve(self, generations=500, offspring_n=300, elite_n=10, time_limit=900):
-        ''' Evolve population, return solution board and time taken'''
+    def hypermutate(self, start, stop, moves=(10, 20)):
+        ''' Mutate every sample in rows start:stop with many moves and rescore them '''
+        self.mutate_batch(self.boards[start:stop], mutation_rate=np.inf, moves=moves)
+        self.evaluate(start, stop)
+
+    def restart(self, population_n, keep=1):
+        ''' Replace the population with population_n fresh samples, keep of them the best in the archive '''
+        keep = min(keep, len(self.archive))
+        self.size = 0
+        self.add_samples(self.archive[:keep])
+        self.generate_samples(population_n - keep)
+
+    def evolve(self, generations=500, offspring_n=300, elite_n=10, time_limit=900,
+               selection='roulette', selection_params=None, callback=None,
+               stagnation_limit=50, min_diversity=0.1, max_hypermutations=2,
+               finish_conflicts=None, finish_agreement=0.9, finish_nodes=20000):
+        ''' Evolve population, return solution board and time taken
+        selection: 'roulette', 'tournament', 'rank' (see genutils.SELECTION) or a function like them
+        selection_params: extra arguments for it, e.g. {'tournament_size': 5} or {'pressure': 1.8}
+        callback: called as callback(self, generation) after each generation, returning True stops early
+        stagnation_limit: generations without a better best before the population is shaken up. The
+            non-elites are hypermutated and some fresh samples added, unless the elites' diversity is
+            below min_diversity or that has been done max_hypermutations times in a row, then the
+            population restarts from fresh samples. The elites are archived first, so the best sample
+            survives restarts. None adds offspring_n/3 fresh samples every 50 generations instead
+        finish_conflicts: hybrid mode, once the best has at most this many conflicts, or the elites
+            agree with it on finish_agreement of the mutable cells, it is handed to finish (with
+            finish_agreement and finish_nodes). Tried again each time the best improves or the
+            population is shaken up. None is off
+        self.summary is filled in with whether it was solved, generations run, gens_to_solve (None if
+        not solved), wall time, the number of restarts and hypermutations, and finisher attempts and
+        whether the finisher solved it '''
         start_time = time.time()
+        stats = self.stats
+        select = genutils.SELECTION[selection] if isinstance(selection, str) else selection
+        selection_params = selection_params or {}
+        # elites + offspring + the fresh samples added when stagnating
+        self.reserve(max(self.size, elite_n + offspring_n + int(offspring_n/3)))
+        response_start = len(self.evolution)    # stagnation is counted from the last shake up
+        restarts = hypermutations = in_a_row = 0
+        gens_to_solve = None
+        generations_run = 0
+        finish_attempts = 0
+        finished = False
+        finish_below = np.inf   # the finisher is tried again once the best is better than this
         for i in range(generations):
 
             if time.time() - start_time > time_limit:
                 break
 
+            if stats is not None:
+                stats.generations += 1
+                selection_start = time.perf_counter()
+
             # elitism
-            elite_indices, elite_evals, elite_conflicts, elite_boards = self.get_top_k_solutions(elite_n)
-            self.evolution.append(elite_conflicts[0])
+            elite_indices = self.get_top_k_indices(elite_n)
+            self.evolution.append(int(self.conflicts[elite_indices[0]]))
+            self.diversity.append(self.elite_diversity(elite_indices))
 
             # if i % 10 == 0:
-            #     print(f"Best conflicts after {i}/{generations}: {elite_conflicts[0]}")
-            #     print(f"Eval:{elite_evals[0]}\n")
+            #     print(f"Best conflicts after {i}/{generations}: {self.conflicts[elite_indices[0]]}")
 
-            if elite_conflicts[0] == 0:
+            if self.conflicts[elite_indices[0]] == 0:
                 print('Solved')
-                return elite_boards[0], elite_conflicts[0], time.time() - start_time
-
-            # renew population
-            old_population = {k: v for k, v in self.population.items() if k not in elite_indices}
-            self.population = {}
-            for board in elite_boards:
-                self.add_sample(board)
-
-            for _ in range(offspring_n):
-                # divisor = np.sum([1/v['total conflicts'] for v in old_population.values()])
-                # weights = [(1/v['total conflicts'])/divisor for v in old_population.values()]
-                old_keys = list(old_population.keys())
-                conflicts = np.array([old_population[k]['total conflicts'] for k in old_keys])
-                inv_conflicts = 1 / conflicts
-                weights = inv_conflicts / inv_conflicts.sum()
-                parent1_idx, parent2_idx = np.random.choice(old_keys, 2, p=weights)
-
-                rnd = np.random.randn()
-                if rnd < 0.1:
-                    parent1 = elite_boards[np.random.choice(elite_n)]
+                gens_to_solve = i
+                break
+
+            if finish_conflicts is not None and self.conflicts[elite_indices[0]] < finish_below:
+                agreed = self.elite_agreement(elite_indices)
+                if self.conflicts[elite_indices[0]] <= finish_conflicts or \
+                   agreed[self.mutable.mask].mean() >= finish_agreement:
+                    if stats is not None:
+                        finish_start = time.perf_counter()
+                    finish_below = self.conflicts[elite_indices[0]]
+                    finish_attempts += 1
+                    solution = self.finish(elite_indices, agreed, finish_agreement, finish_nodes)
+                    if stats is not None:
+                        stats.add_time('finisher', time.perf_counter() - finish_start)
+                    if solution is not None:
+                        print('Solved by finisher')
+                        self.replace_worst(solution[None])
+                        gens_to_solve = i
+                        finished = True
+                        break
+
+            # the rest of the population are the possible parents, all the pairs are drawn at once
+            is_old = np.ones(self.size, dtype=bool)
+            is_old[elite_indices] = False
+            old_indices = np.flatnonzero(is_old)
+            parents = old_indices[select(self.conflicts[old_indices], (offspring_n, 2), rng=self.rand,
+                                         **selection_params)]
+            # the first parent is an elite instead some of the time
+            num_elite = len(elite_indices)
+            from_elite = self.rand.standard_normal(offspring_n) < 0.1
+            elite_parents = genutils.randint(self.rand, 0, num_elite, size=offspring_n)
+
+            # renew population, built in the second buffer: elites keep their scores
+            next_boards = self.next_boards
+            next_boards[:num_elite] = self.boards[elite_indices]
+            elite_scores = self.scores[elite_indices]
+            if stats is not None:
+                stats.add_time('selection', time.perf_counter() - selection_start)
+                crossover_start = time.perf_counter()
+
+            offspring = next_boards[num_elite:num_elite + offspring_n]
+            parents1 = np.where(from_elite, elite_indices[elite_parents], parents[:, 0])
+            genutils.crossover_batch(self.boards[parents1], self.boards[parents[:, 1]], out=offspring, rng=self.rand)
+            if stats is not None:
+                stats.add_time('crossover', time.perf_counter() - crossover_start)
+                mutation_start = time.perf_counter()
+            self.mutate_batch(offspring)
+            if stats is not None:
+                stats.add_time('mutation', time.perf_counter() - mutation_start)
+
+            # swap the buffers, the offspring are all scored together
+            self.boards, self.next_boards = next_boards, self.boards
+            self.size = num_elite + offspring_n
+            self.scores[:num_elite] = elite_scores
+            self.conflicts[:num_elite] = elite_scores.sum(axis=1)
+            self.evaluate(num_elite, self.size)
+            generations_run += 1
+
+            if stagnation_limit is None:
+                if i != 0 and i % 50 == 0:
+                    self.generate_samples(int(offspring_n/3))
+            elif self.stagnation(response_start) >= stagnation_limit:
+                self.update_archive(np.arange(num_elite), elite_n)
+                if self.diversity[-1] < min_diversity or in_a_row >= max_hypermutations:
+                    self.restart(num_elite + offspring_n)
+                    restarts += 1
+                    in_a_row = 0
                 else:
-                    parent1 = old_population[parent1_idx]['board']
-                parent2 = old_population[parent2_idx]['board']
-                self.crossover(parent1, parent2)
+                    # elites are still in the first rows
+                    self.hypermutate(num_elite, self.size)
+                    self.generate_samples(int(offspring_n/3))
+                    hypermutations += 1
+                    in_a_row += 1
+                response_start = len(self.evolution)
+                finish_below = np.inf   # different elites to agree on now
+
+            if callback is not None and callback(self, i):
+                break
+
+        best_index = self.get_top_k_indices(1)[0]
+        best, best_conflicts = self.boards[best_index].copy(), int(self.conflicts[best_index])
+        if len(self.archive) and self.archive_conflicts[0] < best_conflicts:
+            # lost in a restart
+            best, best_conflicts = self.archive[0].copy(), int(self.archive_conflicts[0])
+        if gens_to_solve is None:
+            self.evolution.append(best_conflicts)
+            if best_conflicts == 0:     # solved in the last generation run
+                gens_to_solve = generations_run
+        elif finished:
+            self.evolution.append(0)
+        seconds = time.time() - start_time
+        self.summary = {'solved': best_conflicts == 0,
+                        'conflicts': best_conflicts,
+                        'generations': generations_run,
+                        'gens_to_solve': gens_to_solve,
+                        'time': seconds,
+                        'restarts': restarts,
+                        'hypermutations': hypermutations,
+                        'finish_attempts': finish_attempts,
+                        'finished': finished}
+        return best, best_conflicts, seconds
+
+    def evolve_islands(self, num_islands=4, population_n=300, migration_interval=20, migrants=None,
+                       topology='ring', seed=None, **evolve_params):
+        ''' Evolve num_islands populations of this GA (same fitness functions and agents) in separate
+        processes, each sending copies of its best samples to another island every migration_interval
+        generations to replace that island's worst. Every island stops once one of them solves the board.
+        population_n: samples generated for each island
+        migrants: samples sent each time, defaults to evolve's elite_n
+        topology: 'ring' sends from island i to island i+1, 'random' to a random other island
+        seed: for np.random.SeedSequence, each island gets its own independent np.random.Generator
+        evolve_params: passed on to evolve, e.g. generations, offspring_n, elite_n, time_limit, selection
+        Return the best board over all islands, its conflicts and time taken like evolve, self.evolution
+        becomes the best conflicts over all islands for each generation and self.summary totals up
+        the islands' summaries, with gens_to_solve from the island that solved it '''
+        if topology not in ('ring', 'random'):
+            raise ValueError(f"unknown topology {topology}, pick 'ring' or 'random'")
+        start_time = time.time()
+        migrants = migrants or evolve_params.get('elite_n', 10)
+        seeds = np.random.SeedSequence(seed).spawn(num_islands)
+        inboxes = [mp.Queue() for _ in range(num_islands)]
+        solved = mp.Event()
+        results = mp.Queue()
+        islands = [mp.Process(target=run_island,
+                              args=(self, island, seeds[island], population_n, migration_interval, migrants,
+                                    topology, inboxes, solved, results, evolve_params))
+                   for island in range(num_islands)]
+        for process in islands:
+            process.start()
+
+        finished = []
+        try:
+            while len(finished) < num_islands:
+                try:
+                    finished.append(results.get(timeout=1))
+                except queue.Empty:
+                    if not any(process.is_alive() for process in islands) and results.empty():
+                        raise RuntimeError(f'{num_islands - len(finished)} island processes stopped without a result')
+        finally:
+            for process in islands:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        # best over all the islands, each island's history is padded with its last value
+        _, board, conflicts, _, _, _ = min(finished, key=lambda result: result[2])
+        evolutions = [evolution for _, _, _, evolution, _, _ in finished]
+        length = max(len(evolution) for evolution in evolutions)
+        self.evolution = np.min([evolution + [evolution[-1]] * (length - len(evolution))
+                                 for evolution in evolutions], axis=0).tolist()
+        summaries = [summary for *_, summary, _ in finished]
+        solved_gens = [summary['gens_to_solve'] for summary in summaries if summary['solved']]
+        seconds = time.time() - start_time
+        self.summary = {'solved': conflicts == 0,
+                        'conflicts': conflicts,
+                        'generations': max(summary['generations'] for summary in summaries),
+                        'gens_to_solve': min(solved_gens) if solved_gens else None,
+                        'time': seconds,
+                        'restarts': sum(summary['restarts'] for summary in summaries),
+                        'hypermutations': sum(summary['hypermutations'] for summary in summaries),
+                        'finish_attempts': sum(summary['finish_attempts'] for summary in summaries),
+                        'finished': any(summary['finished'] for summary in summaries)}
+        if self.stats is not None:
+            for *_, island_stats in finished:
+                self.stats.nodes += island_stats['nodes']
+                self.stats.generations += island_stats['generations']
+                self.stats.times.update(island_stats['times'])
+        return board, conflicts, seconds
+
+
+def run_island(ga, island, seed_seq, population_n, migration_interval, migrants, topology,
+               inboxes, solved, results, evolve_params):
+    ''' One island of SudokuGeneticAlgorithm.evolve_islands, run in its own process '''
+    for inbox in inboxes:
+        inbox.cancel_join_thread()  # migrants still queued for an island that has stopped are dropped
+    np.random.seed(seed_seq.generate_state(4))  # for agents without a batch version, they use np.random
+    ga.rng = np.random.default_rng(seed_seq)
+    ga.size = 0
+    ga.evolution = []
+    ga.stats = None if ga.stats is None else SearchStats()
+    ga.generate_samples(population_n)
+    num_islands = len(inboxes)
 
-            if i != 0 and i % 50 == 0:
-                self.generate_samples(int(offspring_n/3))
+    def exchange(ga, generation):
+        if solved.is_set():
+            return True
+        if num_islands > 1 and (generation + 1) % migration_interval == 0:
+            if topology == 'ring':
+                target = (island + 1) % num_islands
+            else:
+                target = (island + 1 + genutils.randint(ga.rng, 0, num_islands - 1)) % num_islands
+            inboxes[target].put(ga.boards[ga.get_top_k_indices(migrants)])
+            immigrants = []
+            while True:
+                try:
+                    immigrants.append(inboxes[island].get_nowait())
+                except queue.Empty:
+                    break
+            if immigrants:
+                ga.replace_worst(np.concatenate(immigrants))
+        return False
 
-        best_indices, best_evals, best_conflicts, best_boards = self.get_top_k_solutions(1)
-        self.evolution.append(best_conflicts[0])
-        return best_boards[0], best_conflicts[0], time.time() - start_time
+    board, conflicts, _ = ga.evolve(callback=exchange, **evolve_params)
+    if conflicts == 0:
+        solved.set()
+    results.put((island, board, conflicts, ga.evolution, ga.summary,
+                 None if ga.stats is None else ga.stats.to_dict()))
@@ -0,0 +1,96 @@
+"""
+Command line solver: reads one puzzle per line (81 characters for 9x9, '.' or '0' for empty)
+from a file or stdin and writes one solution per line to stdout, in the same order.
+Puzzles are sent to worker processes in chunks and each chunk is written out as soon as it
+and the ones before it are done, so it can sit in a shell pipeline with millions of puzzles.
+A puzzle that can't be solved is written back unchanged and reported on stderr.
+Only the standard library is imported at startup, the solvers are imported by the workers.
+
+    python sudoku_solve.py puzzles.txt > solutions.txt
+    cut -d, -f2 sudoku_datasets/sudoku_hard.csv | tail -n +2 | python sudoku_solve.py -e backtracking -j 4
+"""
+
+from chunked_stream import map_chunks
+from solver_engines import ENGINES, get_solver
+from functools import partial
+import argparse
+import sys
+import os
+
+def solve_lines(engine: str, lines: list) -> list:
+    """Solve a chunk of puzzle lines, this is what the worker processes run
+
+    Args:
+        engine (str): one of ENGINES
+        lines (list): puzzle strings
+
+    Returns:
+        list: (solution string, error message) for each line, the solution is the puzzle
+        itself and the message isn't None if it wasn't solved
+    """
+    import sudoku_tools as sutils
+    solve = get_solver(engine)
+    results = []
+    for line in lines:
+        try:
+            board = sutils.Board.from_string(line)
+        except ValueError as e:
+            results.append((line, f'invalid puzzle: {e}'))
+            continue
+        solution = solve(board)
+        if solution is None:
+            results.append((line, 'no solution found'))
+        else:
+            results.append((sutils.Board.from_array(solution).to_string(), None))
+    return results
+
+
+def solve_stream(lines, engine: str='dlx', processes: int=1, chunk_size: int=64, max_pending: int=None):
+    """Solve a stream of puzzle lines in order, reading ahead at most max_pending chunks
+
+    Args:
+        lines: iterable of puzzle strings, read lazily
+        engine (str, optional): one of ENGINES. Defaults to 'dlx'.
+        processes (int, optional): worker processes, 1 solves in this process. Defaults to 1.
+        chunk_size (int, optional): puzzles sent to a worker at a time. Defaults to 64.
+        max_pending (int, optional): chunks in flight before reading more lines. Defaults to 2 per process.
+
+    Yields:
+        list: the (solution, error) results of each chunk, in order
+    """
+    yield from map_chunks(partial(solve_lines, engine), lines, processes, chunk_size, max_pending)
+
+
+def main(argv: list=None) -> int:
+    parser = argparse.ArgumentParser(description='Solve sudoku puzzles, one per line')
+    parser.add_argument('file', nargs='?', default='-', help='file of puzzles, - or nothing for stdin')
+    parser.add_argument('-e', '--engine', choices=ENGINES, default='dlx', help='solver to use (default: dlx)')
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(),
+                        help='worker processes, 1 solves without a pool (default: all cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=64, help='puzzles per chunk (default: 64)')
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.file == '-' else open(args.file)
+    lines = (line for line in (line.strip() for line in infile) if line) # skip blank lines
+    num_failed = 0
+    line_num = 0
+    try:
+        for results in solve_stream(lines, args.engine, args.processes, args.chunk_size):
+            for solution, error in results:
+                line_num += 1
+                if error is not None:
+                    num_failed += 1
+                    print(f'puzzle {line_num}: {error}', file=sys.stderr)
+            sys.stdout.write(''.join(solution + '\n' for solution, _ in results))
+            sys.stdout.flush()
+    except BrokenPipeError: # e.g. piped into head, stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+    return 1 if num_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,104 @@
-import pandas as pd
+from __future__ import annotations # the type hints mention numpy/pandas without importing them
+from math import isqrt
+
+# numpy is imported inside the functions that use it, and pandas is only needed by the notebooks,
+# so importing this file (and the solvers that use it) stays fast for sudoku_solve.py
 
 EASY_PATH = 'sudoku_datasets/sudoku_easy.csv'
 MED_PATH = 'sudoku_datasets/sudoku_medium.csv'
 HARD_PATH = 'sudoku_datasets/sudoku_hard.csv'
 
+# characters used for the numbers in string boards, boards bigger than 9x9 continue with letters
+DIGIT_CHARS = '123456789ABCDEFGHIJKLMNOP'
+# bytes.translate tables between string boards and cell values, '.' or '0' for empty
+CHAR_VALUES = bytes.maketrans(b'.0' + DIGIT_CHARS.encode() + DIGIT_CHARS[9:].lower().encode(),
+                              bytes([0, 0]) + bytes(range(1, 26)) + bytes(range(10, 26)))
+VALUE_CHARS = bytes.maketrans(bytes(range(26)), b'.' + DIGIT_CHARS.encode())
+
+
+def get_box_size(board) -> int:
+    """Get the size of the boxes of a square board (3 for 9x9, 4 for 16x16, 5 for 25x25)
+
+    Args:
+        board: the board as a 2d list/array, or the number of rows
+
+    Returns:
+        int: the box size
+    """
+    size = board if isinstance(board, int) else len(board)
+    box_size = isqrt(size)
+    if box_size * box_size != size:
+        raise ValueError(f'a board needs a square number of rows, got {size}')
+    return box_size
+
+def cell_to_char(num: int) -> str:
+    """Get the character for a number in a string board
+
+    Args:
+        num (int): the number, 0 for empty
+
+    Returns:
+        str: the character, '.' for empty
+    """
+    return DIGIT_CHARS[num - 1] if num != 0 else '.'
+
+def char_to_cell(char: str) -> int:
+    """Get the number for a character in a string board
+
+    Args:
+        char (str): the character, '.' or '0' for empty
+
+    Returns:
+        int: the number, 0 for empty
+    """
+    if char in '.0':
+        return 0
+    return DIGIT_CHARS.index(char.upper()) + 1
+
+def string_to_array(board: str) -> list:
+    """Turn the csv file version (string) of a board of any size into an array of ints
+
+    Args:
+        board (str): the board as a string representation, one character per cell
+
+    Returns:
+        list: data as a 2d array of ints
+    """
+    size = isqrt(len(board))
+    get_box_size(size) # check it's a valid size
+    return [[char_to_cell(char) for char in board[i*size:(i+1)*size]] for i in range(size)]
+
+def array_to_string(board_2d: list) -> str:
+    """Turn an array of ints into the csv file version (string) of the board
+
+    Args:
+        board_2d (list): board as an array of ints
+
+    Returns:
+        str: one character per cell
+    """
+    return ''.join(cell_to_char(int(cell)) for row in board_2d for cell in row)
+
+
+def format_rows(rows: list) -> str:
+    """Lay out rows of cell characters with lines between the boxes
+
+    Args:
+        rows (list): each row as a list of single characters
+
+    Returns:
+        str: a formatted string of the board
+    """
+    size = len(rows)
+    box_size = get_box_size(size)
+    width = 2 * size - 1 + 2 * (box_size - 1) # cells with spaces, plus the ' |' separators
+    board_str = ""
+    for i, row in enumerate(rows):
+        boxes = [' '.join(row[j:j+box_size]) for j in range(0, size, box_size)]
+        board_str += ' | '.join(boxes) + '\n'
+        if i % box_size == box_size - 1 and i != size - 1:
+            board_str += '-' * width + '\n'
+    return board_str
 
 def display_board(board: str) -> str:
     """Get the board from the csv file version (string)
@@ -14,14 +109,9 @@ def display_board(board: str) -> str:
     Returns:
         str: a formatted string of the board
     """
+    size = isqrt(len(board))
     split_board = list(board)
-    board_str = ""
-    for i in range(9):
-        row = split_board[i*9:(i+1)*9]
-        board_str += ' '.join(row[0:3]) + ' | ' + ' '.join(row[3:6]) + ' | ' + ' '.join(row[6:9]) + '\n'
-        if i in [2, 5]:
-            board_str += '-' * 21 + '\n'
-    return board_str
+    return format_rows([split_board[i*size:(i+1)*size] for i in range(size)])
 
 def get_board_details(board_details: pd.Series) -> tuple:
     """Gets the details for a specified row of the csv
@@ -59,7 +149,7 @@ def formatted_to_array(formatted_str: str) -> list:
         if '-' in row:
             continue
         clean_row = row.replace('|', '').strip().split()
-        int_row = [0 if cell == '.' else int(cell) for cell in clean_row]
+        int_row = [char_to_cell(cell) for cell in clean_row]
         board_2d.append(int_row)
 
     return board_2d
@@ -73,72 +163,186 @@ def array_to_formatted(board_2d: list) -> str:
     Returns:
         str: formatted string representation for reading
     """
-    board_str = ""
-    for i, row in enumerate(board_2d):
-        display_row = [str(cell) if cell != 0 else '.' for cell in row]
-        board_str += ' '.join(display_row[:3]) + ' | ' + ' '.join(display_row[3:6]) + ' | ' + ' '.join(display_row[6:]) + '\n'
-        if i in [2, 5]:
-            board_str += '-' * 21 + '\n'
-    return board_str
+    return format_rows([[cell_to_char(int(cell)) for cell in row] for row in board_2d])
+
+
+class Board():
+    """A board stored as one byte per cell, row by row (0 for empty)
+    It indexes like a 2d list (board[row][col], len, iterating over rows), so it can be
+    passed to any of the solvers as is. The rows are memoryviews of the cells, and
+    row/col/box give numpy views, so none of them copy. str() renders the board
+    """
+    __slots__ = ('size', 'box_size', 'cells', 'rows', '_grid')
+
+    def __init__(self, cells):
+        """
+        Args:
+            cells: the cell values row by row (bytes, bytearray or a list of ints)
+        """
+        self.cells = bytearray(cells)
+        self.size = isqrt(len(self.cells))
+        self.box_size = get_box_size(self.size)
+        if self.size * self.size != len(self.cells) or max(self.cells, default=0) > self.size:
+            raise ValueError(f'not a valid board: {len(self.cells)} cells, max value {max(self.cells, default=0)}')
+        view = memoryview(self.cells)
+        self.rows = [view[i*self.size:(i+1)*self.size] for i in range(self.size)]
+        self._grid = None
+
+    @classmethod
+    def from_string(cls, board: str) -> 'Board':
+        """Make a board from the csv file version (string)
+
+        Args:
+            board (str): one character per cell, '.' or '0' for empty
+
+        Returns:
+            Board: the board
+        """
+        return cls(board.encode('ascii').translate(CHAR_VALUES))
+
+    @classmethod
+    def from_array(cls, board_2d) -> 'Board':
+        """Make a board from a 2d list/array of ints
+
+        Args:
+            board_2d: board as an array of ints, 0 for empty
+
+        Returns:
+            Board: the board
+        """
+        if isinstance(board_2d, Board):
+            return board_2d.copy()
+        return cls(int(num) for row in board_2d for num in row)
+
+    def to_string(self) -> str:
+        """Get the csv file version (string) of the board
+
+        Returns:
+            str: one character per cell, '.' for empty
+        """
+        return self.cells.translate(VALUE_CHARS).decode('ascii')
+
+    def to_list(self) -> list:
+        """Get the board as a 2d list of ints
+
+        Returns:
+            list: a new 2d list
+        """
+        return [list(row) for row in self.rows]
+
+    def copy(self) -> 'Board':
+        return Board(self.cells)
+
+    @property
+    def grid(self) -> np.ndarray:
+        """The cells as a (size, size) numpy array, a view so changes go both ways"""
+        if self._grid is None:
+            import numpy as np
+            self._grid = np.frombuffer(self.cells, dtype=np.uint8).reshape(self.size, self.size)
+        return self._grid
+
+    def row(self, i: int) -> np.ndarray:
+        return self.grid[i]
+
+    def col(self, j: int) -> np.ndarray:
+        return self.grid[:, j]
+
+    def box(self, k: int) -> np.ndarray:
+        """Get a box, numbered left to right then top to bottom
+
+        Args:
+            k (int): the box number
+
+        Returns:
+            np.ndarray: a (box_size, box_size) view of the box
+        """
+        b = self.box_size
+        row, col = (k // b) * b, (k % b) * b
+        return self.grid[row:row+b, col:col+b]
+
+    def num_matching(self, other) -> int:
+        """Count the cells that are the same as in another board
 
-def get_test_boards(difficulty: str, num_examples: int=10) -> list:
+        Args:
+            other: a Board or a 2d list/array of ints
+
+        Returns:
+            int: number of matching cells
+        """
+        if not isinstance(other, Board):
+            other = Board.from_array(other)
+        return int((self.grid == other.grid).sum())
+
+    def __getitem__(self, row: int) -> memoryview:
+        return self.rows[row]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None and not copy:
+            return self.grid
+        return self.grid.astype(dtype if dtype is not None else self.grid.dtype)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Board) and self.cells == other.cells
+
+    __hash__ = None # the cells can change
+
+    def __reduce__(self):
+        return (Board, (bytes(self.cells),))
+
+    def __repr__(self) -> str:
+        return f"Board('{self.to_string()}')"
+
+    def __str__(self) -> str:
+        return format_rows([list(self.to_string()[i*self.size:(i+1)*self.size]) for i in range(self.size)])
+
+
+def get_test_boards(difficulty: str, num_examples: int=10, seed: int=None, store_path: str=None) -> list:
     """Get a specified number of boards under a difficulty
 
     Args:
         difficulty (str): easy, medium, or hard
         num_examples (int, optional): Number of boards to fetch. Defaults to 10.
+        seed (int, optional): random seed, the same seed gives the same boards. Defaults to None.
+        store_path (str, optional): puzzle store to sample from (see puzzle_store.py), it is compiled
+            from the csv files the first time. Defaults to None (the store of the bundled csvs).
 
     Returns:
-        list: list of dictionaries containing all the information for each sampled board
+        list: list of dictionaries containing all the information for each sampled board,
+        the puzzle and solution are Boards
     """
-    if difficulty.lower() == 'easy':
-        path = EASY_PATH
-    elif difficulty.lower() == 'medium':
-        path = MED_PATH
-    elif difficulty.lower() == 'hard':
-        path = HARD_PATH
-    else:
+    import puzzle_store # puzzle_store imports this file
+    if difficulty.lower() not in puzzle_store.DIFFICULTY_RANGES:
         print('Please give one of the following difficulties: "easy", "medium", "hard"')
         return []
     
-    boards_data = []
-    
-    df = pd.read_csv(path)
-    sampled_boards = df.sample(n=num_examples, replace=False)
-
-    for _, board_row in sampled_boards.iterrows():
-        board, solution, num_clues, difficulty_rating = get_board_details(board_row)
-        board_input = formatted_to_array(board)
-        
-        one_board_data = {
-            'board': board,
-            'board_input': board_input,
-            'solution': solution,
-            'num_clues': num_clues,
-            'difficulty_rating': difficulty_rating
-        }
-        
-        boards_data.append(one_board_data)
-
-    return boards_data
+    if store_path is None:
+        store = puzzle_store.open_store()
+    else:
+        store = puzzle_store.PuzzleStore(store_path)
+    ids = store.sample(num_examples, difficulty=difficulty.lower(), seed=seed)
+    return store.get_records(ids)
 
 def check_solution(generated_sol: list, actual_sol: list) -> tuple:
     """Checks if solution is the same as the provided answer
 
     Args:
-        generated_sol (list): 2d representation of generated board
-        actual_sol (list): 2d representation of provided board
+        generated_sol (list): 2d representation of generated board (or a Board)
+        actual_sol (list): 2d representation of provided board (or a Board)
 
     Returns:
         tuple: the percent and number correct
     """
-    num_correct = 0
-    for row_gen, row_act in zip(generated_sol, actual_sol):
-        for val_gen, val_act in zip(row_gen, row_act):
-            if val_gen == val_act:
-                num_correct += 1
+    if not isinstance(actual_sol, Board):
+        actual_sol = Board.from_array(actual_sol)
+    num_correct = actual_sol.num_matching(generated_sol)
             
-    percent_correct = num_correct/81
+    percent_correct = num_correct/(len(actual_sol) ** 2)
     
     return percent_correct, num_correct
 
@@ -146,12 +350,12 @@ def is_valid_sequence(sequence: list) -> bool:
     """Check if a sequence is valid
 
     Args:
-        sequence (list): a list of ints ranging from 1-9
+        sequence (list): a list of ints ranging from 1-9 (1-n for bigger boards)
 
     Returns:
         bool: if the sequence is unique 1-9 (valid sudoku)
     """
-    all_nums = set(range(1,10))
+    all_nums = set(range(1, len(sequence) + 1))
     current_sequence = set(sequence)
     
     return current_sequence == all_nums
@@ -173,19 +377,22 @@ def is_valid_board(board: list) -> bool:
     cols = []
     cells = []
     
+    size = len(board)
+    box_size = get_box_size(size)
+    
     # get the cols
-    for i in range(9):
+    for i in range(size):
         col = []
         for row in board:
             col.append(row[i])
         cols.append(col)
         
     # get the cells
-    for cell_row in range(0, 9, 3):
-        for cell_col in range(0, 9, 3):
+    for cell_row in range(0, size, box_size):
+        for cell_col in range(0, size, box_size):
             cell = []
-            for i in range(3):
-                for j in range(3):
+            for i in range(box_size):
+                for j in range(box_size):
                     cell.append(board[cell_row + i][cell_col + j])
             cells.append(cell)
             
@@ -213,7 +420,7 @@ def is_currently_valid_sequence(sequence: list) -> bool:
     """Check if a sequence is currently valid
 
     Args:
-        sequence (list): a list of ints ranging from 1-9
+        sequence (list): a list of ints ranging from 1-9 (1-n for bigger boards)
 
     Returns:
         bool: if the sequence is unique 1-9 (valid sudoku)
@@ -240,19 +447,22 @@ def is_currently_valid_board(board: list) ->bool:
     cols = []
     cells = []
     
+    size = len(board)
+    box_size = get_box_size(size)
+    
     # get the cols
-    for i in range(9):
+    for i in range(size):
         col = []
         for row in board:
             col.append(row[i])
         cols.append(col)
         
     # get the cells
-    for cell_row in range(0, 9, 3):
-        for cell_col in range(0, 9, 3):
+    for cell_row in range(0, size, box_size):
+        for cell_col in range(0, size, box_size):
             cell = []
-            for i in range(3):
-                for j in range(3):
+            for i in range(box_size):
+                for j in range(box_size):
                     cell.append(board[cell_row + i][cell_col + j])
             cells.append(cell)
             
@@ -277,6 +487,110 @@ def is_currently_valid_board(board: list) ->bool:
     return all([all_rows, all_cols, all_cells])
 
 
+# ------------- batch versions, for many boards at once -------------
+
+def to_board_batch(boards) -> np.ndarray:
+    """Get many boards as one (N, n, n) int array
+
+    Args:
+        boards: (N, n, n) or (N, n*n) array (or list of 2d lists/Boards), 0 for empty
+
+    Returns:
+        np.ndarray: (N, n, n) array
+    """
+    import numpy as np
+    boards = np.asarray(boards)
+    if boards.ndim == 2:
+        size = isqrt(boards.shape[1])
+        boards = boards.reshape(len(boards), size, size)
+    get_box_size(boards.shape[1]) # check it's a valid size
+    return boards
+
+def get_units_batch(boards) -> np.ndarray:
+    """Get every row, col and box of many boards
+
+    Args:
+        boards: (N, n, n) array of ints (see to_board_batch)
+
+    Returns:
+        np.ndarray: (N, 3n, n) array, the rows then cols then boxes (27 units on a 9x9 board)
+    """
+    import numpy as np
+    boards = to_board_batch(boards)
+    num_boards, size = boards.shape[:2]
+    box_size = get_box_size(size)
+    boxes = boards.reshape(num_boards, box_size, box_size, box_size, box_size).swapaxes(2, 3)
+    return np.concatenate((boards, boards.swapaxes(1, 2), boxes.reshape(num_boards, size, size)), axis=1)
+
+def unit_counts_batch(boards) -> np.ndarray:
+    """Count how many times each number is in each unit of many boards
+
+    Args:
+        boards: (N, n, n) array of ints (see to_board_batch)
+
+    Returns:
+        np.ndarray: (N, 3n, n) array, [board, unit, num - 1] is how many times num is in the unit
+    """
+    import numpy as np
+    units = get_units_batch(boards)
+    num_boards, num_units, size = units.shape
+    # one bincount over every unit, each unit gets its own block of size + 1 bins (0 is empty)
+    offsets = np.arange(num_boards * num_units).reshape(num_boards, num_units, 1) * (size + 1)
+    counts = np.bincount((units + offsets).ravel(), minlength=num_boards * num_units * (size + 1))
+    return counts.reshape(num_boards, num_units, size + 1)[:, :, 1:]
+
+def unit_conflicts_batch(boards) -> np.ndarray:
+    """Count the repeated numbers in each unit of many boards (empty cells are ignored), for
+    full boards this is the same as the row/col/box conflicts in genetic_functions
+
+    Args:
+        boards: (N, n, n) array of ints (see to_board_batch)
+
+    Returns:
+        np.ndarray: (N, 3n) array of conflicts, the rows then cols then boxes
+    """
+    counts = unit_counts_batch(boards)
+    return (counts - 1).clip(min=0).sum(axis=2)
+
+def is_valid_board_batch(boards) -> np.ndarray:
+    """Checks if many boards are valid sudoku solutions
+
+    Args:
+        boards: (N, n, n) array of ints (see to_board_batch)
+
+    Returns:
+        np.ndarray: (N,) bool array
+    """
+    return (unit_counts_batch(boards) == 1).all(axis=(1, 2))
+
+def is_currently_valid_board_batch(boards) -> np.ndarray:
+    """Checks if many boards are currently valid (no repeats, ignoring 0s)
+
+    Args:
+        boards: (N, n, n) array of ints (see to_board_batch)
+
+    Returns:
+        np.ndarray: (N,) bool array
+    """
+    return (unit_counts_batch(boards) <= 1).all(axis=(1, 2))
+
+def check_solution_batch(generated_sols, actual_sols) -> tuple:
+    """Checks how much of many solutions are the same as the provided answers
+
+    Args:
+        generated_sols: (N, n, n) array of generated boards (see to_board_batch)
+        actual_sols: (N, n, n) array of the provided boards
+
+    Returns:
+        tuple: (N,) arrays of the percent and number correct
+    """
+    generated_sols = to_board_batch(generated_sols)
+    actual_sols = to_board_batch(actual_sols)
+    num_correct = (generated_sols == actual_sols).sum(axis=(1, 2))
+    percent_correct = num_correct / actual_sols[0].size if len(actual_sols) else num_correct.astype(float)
+    return percent_correct, num_correct
+
+
 
 
 def main():
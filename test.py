@@ -10,8 +10,10 @@ print('Each board has a dict with information. Let\'s look at the first one:')
 test_example = test_boards[0]
 pprint.pp(test_example)
 
-print('The data that we will pass into each algorithm is a 2D list:')
-pprint.pp(test_example['board_input'])
+print('The data that we will pass into each algorithm is a Board, it indexes like a 2D list:')
+pprint.pp(test_example['board_input'].to_list())
+print('It is only rendered when printed:')
+print(test_example['board_input'])
 
 
 print('Somewhere we will need to convert the generated answer into a readable format:')
@@ -22,15 +24,15 @@ print(to_string)
 
 
 print('We also may need to convert the solution board into the array format so we can check if the algorithm did a good job')
-to_array = sutils.formatted_to_array(test_example['solution'])
+to_array = sutils.formatted_to_array(str(test_example['solution']))
 pprint.pp(to_array)
 
 
 print('Let\'s check how many are correct between two different solutions')
 print('For this we pretend that these are the algorithms generated sols')
-generated_sol = sutils.formatted_to_array(test_boards[0]['solution'])
-actual_sol1 = sutils.formatted_to_array(test_boards[0]['solution'])
-actual_sol2 = sutils.formatted_to_array(test_boards[1]['solution'])
+generated_sol = test_boards[0]['solution'].to_list()
+actual_sol1 = test_boards[0]['solution']
+actual_sol2 = test_boards[1]['solution']
 
 pct_diff, num_diff = sutils.check_solution(generated_sol=generated_sol, actual_sol=actual_sol2)
 pct_same, num_same = sutils.check_solution(generated_sol=generated_sol, actual_sol=actual_sol1)
@@ -63,6 +65,13 @@ test_valid =  [[3, 5, 7, 2, 6, 4, 9, 8, 0],
 print('invalid:', sutils.is_currently_valid_board(test_invalid))
 print('valid:', sutils.is_currently_valid_board(test_valid))
 
+print('The parallel search can collect stats too, merged over all of its workers:')
+from sudoku_backtracking import test_level
+times, percents, all_stats = test_level(difficulty='hard', num_examples=2, solver='parallel', collect_stats=True, seed=0, processes=2)
+pprint.pp(all_stats)
+print('every board solved:', all(pct == 1 for pct in percents))
+print('nodes counted for every board:', all(stats['nodes'] > 0 for stats in all_stats))
+
 # print('Let\'s use the other functions to check if a board is correct\n'
 #       'used for the algorithms and also if there is a valid solution that doesnt match the provided one')
 # false_board = [[1, 2, 3, 4, 5, 6, 7, 8, 9],